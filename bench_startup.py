@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the M3U Scraper command line interface
+Measures how long short invocations take from process start to exit
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'cli.py')
+
+# Size of the cached scrape the export command is timed against
+SEED_STREAMS = 2000
+
+
+def seed_output(output_dir: str):
+    """Write a cached complete_data.json like a finished scrape leaves behind"""
+    categories = [{'category_id': str(number), 'category_name': f"Category {number}", 'parent_id': 0}
+                  for number in range(20)]
+    streams = [{'num': number, 'name': f"Channel {number}", 'stream_type': 'live', 'stream_id': number,
+                'stream_icon': f"http://logos.example.com/{number}.png", 'epg_channel_id': None,
+                'category_id': str(number % 20), 'category_name': f"Category {number % 20}"}
+               for number in range(SEED_STREAMS)]
+    complete_data = {
+        'server': 'http://provider.example.com',
+        'username': 'bench',
+        'scrape_date': '2024-01-01T00:00:00',
+        'total_categories': len(categories),
+        'total_streams': len(streams),
+        'categories': categories,
+        'streams': streams
+    }
+    with open(os.path.join(output_dir, 'complete_data.json'), 'w', encoding='utf-8') as f:
+        json.dump(complete_data, f, indent=2)
+
+
+def time_command(args, runs: int, cwd: str = None) -> list:
+    """Run a CLI command several times and return the wall times in milliseconds"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, CLI] + args, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, cwd=cwd, check=False)
+        timings.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            # Timing an error exit would hide the real cost of the command
+            raise SystemExit(f"❌ cli.py {' '.join(args)} failed: {result.stderr.decode().strip()}")
+    return timings
+
+
+def main():
+    """Run the benchmark"""
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    print("⏱️  M3U Scraper Startup Benchmark")
+    print("=" * 40)
+
+    baseline = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=False)
+        baseline.append((time.perf_counter() - start) * 1000)
+    print(f"  python -c pass        median {statistics.median(baseline):6.1f} ms")
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        seed_output(output_dir)
+        playlist = os.path.join(output_dir, 'bench.m3u')
+        commands = {
+            'cli.py --help': ['--help'],
+            'cli.py status': ['status', '--output-dir', output_dir],
+            'cli.py export': ['export', '--output-dir', output_dir, '-o', playlist, '--password', 'bench'],
+        }
+        for label, args in commands.items():
+            # Run from the temp directory so no scraper_config.json is picked up
+            timings = time_command(args, runs, cwd=output_dir)
+            print(f"  {label:<21} median {statistics.median(timings):6.1f} ms   min {min(timings):6.1f} ms")
+
+    print("=" * 40)
+    print(f"{runs} runs per command, export of {SEED_STREAMS} cached streams")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+M3U Scraper - Command Line Interface
+Non-interactive entry point for scripts and cron jobs
+
+Credentials are taken from the command line, then the IPTV_USERNAME,
+IPTV_PASSWORD and IPTV_SERVER environment variables, then the config file.
+Heavy modules are only imported by the subcommands that need them.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_DIR, 'output')
+DEFAULT_CONFIG_FILE = "scraper_config.json"
+# storage.FORMATS, listed here so startup does not import storage
+OUTPUT_FORMATS = ['json', 'json-compact', 'jsonl', 'json.gz', 'jsonl.gz', 'json.zst', 'jsonl.zst', 'parquet']
+
+
+def load_credentials(args) -> tuple:
+    """Resolve username, password and server from arguments, environment and config"""
+    config = {}
+    config_file = args.config or DEFAULT_CONFIG_FILE
+    if os.path.exists(config_file):
+        with open(config_file, 'r') as f:
+            config = json.load(f)
+    elif args.config:
+        raise SystemExit(f"❌ Config file not found: {args.config}")
+
+    username = args.username or os.environ.get('IPTV_USERNAME') or config.get('username')
+    password = args.password or os.environ.get('IPTV_PASSWORD') or config.get('password')
+    server = args.server or os.environ.get('IPTV_SERVER') or config.get('server')
+
+    if server and not server.startswith(('http://', 'https://')):
+        server = 'http://' + server
+
+    return username, password, server
+
+
+def require_credentials(args) -> tuple:
+    """Resolve credentials and exit if any are missing"""
+    username, password, server = load_credentials(args)
+    missing = [name for name, value in (('username', username), ('password', password), ('server', server))
+               if not value]
+    if missing:
+        raise SystemExit(f"❌ Missing {', '.join(missing)} (use options, IPTV_* environment variables or --config)")
+    return username, password, server
+
+
+def cmd_scrape(args) -> int:
+    """Run a full scrape"""
+    username, password, server = require_credentials(args)
+
+    from log_setup import configure_logging
+    from robust_iptv_scraper import RobustIPTVScraper
+
+    configure_logging(args.log_file, json_format=args.log_json or None)
+    try:
+        scraper = RobustIPTVScraper(
+            username, password, server, output_dir=args.output_dir,
+            fetch_strategy=args.strategy, queue_path=args.queue, worker_id=args.worker_id,
+            mirror_logos=args.mirror_logos, logo_base_url=args.logo_base_url, logo_size=args.logo_size,
+            output_format=args.format, write_category_files=not args.no_category_files,
+            memory_budget_mb=args.memory_mb
+        )
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    m3u_file = scraper.run()
+    if not m3u_file and scraper.reduced_by:
+        print(f"Queue drained, outputs are assembled by worker {scraper.reduced_by}", file=sys.stderr)
+        return 0
+    if not m3u_file:
+        print("❌ Failed to create M3U playlist", file=sys.stderr)
+        return 1
+    print(m3u_file)
+    return 0
+
+
+def cmd_reduce(args) -> int:
+    """Assemble the outputs of a shared scrape from its work queue"""
+    username, password, server = require_credentials(args)
+
+    from log_setup import configure_logging
+    from robust_iptv_scraper import RobustIPTVScraper
+
+    configure_logging(args.log_file, json_format=args.log_json or None)
+    try:
+        scraper = RobustIPTVScraper(username, password, server, output_dir=args.output_dir,
+                                    queue_path=args.queue, memory_budget_mb=args.memory_mb)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    if not scraper.work_queue.is_drained():
+        print("❌ The work queue still has pending categories", file=sys.stderr)
+        return 1
+    owner = scraper.work_queue.claim_reduction(scraper.worker_id, force=args.force)
+    if owner != scraper.worker_id:
+        print(f"❌ Outputs are already assembled by worker {owner} (use --force to assemble them again)",
+              file=sys.stderr)
+        return 1
+    data = scraper.reduce_queue()
+    print(scraper.create_m3u_playlist(data['streams']))
+    scraper.cleanup_spill()
+    return 0
+
+
+def describe_file(path: str) -> str:
+    """Summarise a file's size and modification time"""
+    from datetime import datetime
+
+    stat = os.stat(path)
+    modified = datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+    return f"{path} ({stat.st_size / 1024 / 1024:.1f} MB, {modified})"
+
+
+def latest_playlist(output_dir: str):
+    """Return the most recently written playlist, if any"""
+    playlists_dir = os.path.join(output_dir, 'playlists')
+    if not os.path.isdir(playlists_dir):
+        return None
+    playlists = [entry for entry in os.scandir(playlists_dir) if entry.name.endswith('.m3u')]
+    if not playlists:
+        return None
+    return max(playlists, key=lambda entry: entry.stat().st_mtime).path
+
+
+def cmd_status(args) -> int:
+    """Show what the last scrape left in the output directory"""
+    print(f"Output directory: {args.output_dir}")
+
+    playlist = latest_playlist(args.output_dir)
+    print(f"Latest playlist:  {describe_file(playlist) if playlist else 'none'}")
+
+    from storage import find_data
+
+    complete_file = find_data(os.path.join(args.output_dir, 'complete_data'))
+    print(f"Complete data:    {describe_file(complete_file) if complete_file else 'none'}")
+
+    progress_file = os.path.join(args.output_dir, 'logs', 'scrape_progress.json')
+    if os.path.exists(progress_file):
+        with open(progress_file, 'r') as f:
+            progress = json.load(f)
+        print(f"Progress:         {len(progress.get('completed_categories', []))} categories completed, "
+              f"last updated {progress.get('last_updated', 'unknown')}")
+    else:
+        print("Progress:         none")
+
+    from snapshot_index import generations
+
+    snapshot_dir = os.path.join(args.output_dir, 'snapshot')
+    kept = generations(snapshot_dir)
+    if kept:
+        from datetime import datetime
+        from snapshot_index import SnapshotIndex
+
+        try:
+            with SnapshotIndex(snapshot_dir) as snapshot:
+                created = datetime.fromtimestamp(snapshot.created).strftime('%Y-%m-%d %H:%M:%S')
+                print(f"Snapshot:         generation {snapshot.generation}, {len(snapshot)} streams, {created} "
+                      f"(kept: {', '.join(map(str, kept))})")
+        except ValueError as e:
+            print(f"Snapshot:         ❌ {e} (kept: {', '.join(map(str, kept))})")
+    else:
+        print("Snapshot:         none")
+
+    if args.queue:
+        from work_queue import CategoryWorkQueue
+
+        counts = CategoryWorkQueue(args.queue).stats()
+        print("Work queue:       " + ", ".join(f"{count} {state}" for state, count in counts.items()))
+    return 0
+
+
+def cmd_export(args) -> int:
+    """Write a playlist from the cached complete_data without contacting the server"""
+    from storage import find_data, load_data
+
+    complete_file = find_data(os.path.join(args.output_dir, 'complete_data'))
+    if not complete_file:
+        print(f"❌ No cached scrape found in {args.output_dir}", file=sys.stderr)
+        return 1
+
+    data = load_data(complete_file)
+
+    username, password, server = load_credentials(args)
+    username = username or data.get('username')
+    server = server or data.get('server')
+    if not (username and password and server):
+        print("❌ Stream URLs need username, password and server (use options, IPTV_* "
+              "environment variables or --config)", file=sys.stderr)
+        return 1
+
+    from datetime import datetime
+    from iptv_client import M3USink, XtreamClient
+
+    output = args.output
+    if not output:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        os.makedirs(os.path.join(args.output_dir, 'playlists'), exist_ok=True)
+        output = os.path.join(args.output_dir, 'playlists', f"iptv_complete_playlist_{timestamp}.m3u")
+
+    client = XtreamClient(username, password, server)
+    with M3USink(output) as playlist:
+        for stream in data.get('streams', []):
+            stream['stream_url'] = client.build_stream_url(stream.get('stream_id', ''))
+            playlist.write(stream)
+
+    print(output)
+    return 0
+
+
+def find_snapshot_dir(directory: str) -> str:
+    """Accept either an output directory or its snapshot directory"""
+    from snapshot_index import generations
+
+    if not generations(directory):
+        directory = os.path.join(directory, 'snapshot')
+    if not generations(directory):
+        raise SystemExit(f"❌ No snapshot index found in {directory}")
+    return directory
+
+
+def open_snapshot(directory: str, generation: int = None):
+    """Open a snapshot generation (the newest by default)"""
+    from snapshot_index import SnapshotIndex
+
+    try:
+        return SnapshotIndex(find_snapshot_dir(directory), generation)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+
+
+def cmd_lookup(args) -> int:
+    """Print streams from the snapshot by stream or category ID"""
+    with open_snapshot(args.output_dir, args.generation) as snapshot:
+        found = False
+        for stream_id in args.stream_id:
+            stream = snapshot.get(stream_id)
+            if stream is None:
+                print(f"❌ Stream not found: {stream_id}", file=sys.stderr)
+                continue
+            print(json.dumps(stream, ensure_ascii=False))
+            found = True
+        for category_id in args.category_id:
+            for stream in snapshot.category(category_id):
+                print(json.dumps(stream, ensure_ascii=False))
+                found = True
+    return 0 if found else 1
+
+
+def cmd_diff(args) -> int:
+    """Compare the snapshot in the output directory against an older one"""
+    from snapshot_index import generations
+
+    with open_snapshot(args.output_dir, args.generation) as new:
+        if args.previous:
+            old = open_snapshot(args.previous)
+        else:
+            # Previous generation kept in the same directory
+            older = [generation for generation in generations(new.directory) if generation < new.generation]
+            if not older:
+                raise SystemExit(f"❌ No generation older than {new.generation} in {new.directory}")
+            old = open_snapshot(new.directory, older[-1])
+        with old:
+            changes = new.diff(old)
+
+    if args.json:
+        print(json.dumps(changes, ensure_ascii=False, indent=2))
+        return 0
+
+    symbols = {'added': '+', 'removed': '-', 'changed': '~'}
+    for change, streams in changes.items():
+        for stream in streams:
+            print(f"{symbols[change]} {stream.get('stream_id')}\t{stream.get('category_name', '')}\t{stream.get('name', '')}")
+    print(", ".join(f"{len(streams)} {change}" for change, streams in changes.items()), file=sys.stderr)
+    return 0
+
+
+def cmd_merge(args) -> int:
+    """Merge several playlists"""
+    from log_setup import configure_logging
+    from m3u_merge import merge_playlists
+
+    configure_logging(args.log_file, json_format=args.log_json or None)
+    stats = merge_playlists(args.inputs, args.output, group_order=args.group_order,
+                            dedupe=not args.keep_duplicates, memory_budget=args.memory_mb * 1024 * 1024)
+    print(f"{args.output} ({stats['written']} channels)")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser"""
+    parser = argparse.ArgumentParser(prog="cli.py", description="M3U IPTV Scraper")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help="Output directory")
+    common.add_argument('--log-file', help="Also write logs to this file")
+    common.add_argument('--log-json', action='store_true', help="Write structured JSON log records")
+
+    credentials = argparse.ArgumentParser(add_help=False)
+    credentials.add_argument('--username', help="IPTV username (or IPTV_USERNAME)")
+    credentials.add_argument('--password', help="IPTV password (or IPTV_PASSWORD)")
+    credentials.add_argument('--server', help="IPTV server URL (or IPTV_SERVER)")
+    credentials.add_argument('--config', help=f"JSON config file (default: {DEFAULT_CONFIG_FILE} if present)")
+
+    scrape = subparsers.add_parser('scrape', parents=[common, credentials], help="Scrape all channels")
+    scrape.add_argument('--strategy', choices=['api', 'm3u'], default='api',
+                        help="Crawl player_api.php or try the get.php m3u_plus export first")
+    scrape.add_argument('--queue', help="Work queue database shared by worker processes on this host")
+    scrape.add_argument('--worker-id', help="Worker name for the shared queue")
+    scrape.add_argument('--mirror-logos', action='store_true', help="Mirror channel logos locally")
+    scrape.add_argument('--logo-base-url', help="URL the logo mirror is served from")
+    scrape.add_argument('--logo-size', type=int, help="Resize mirrored logos to fit this many pixels")
+    scrape.add_argument('--format', choices=OUTPUT_FORMATS, default='json', help="Output encoding")
+    scrape.add_argument('--no-category-files', action='store_true',
+                        help="Skip the per-category stream files (complete_data has every stream)")
+    scrape.add_argument('--memory-mb', type=int,
+                        help="Bounded-memory mode: sort streams on disk within this budget")
+    scrape.set_defaults(func=cmd_scrape)
+
+    reduce = subparsers.add_parser('reduce', parents=[common, credentials],
+                                   help="Assemble outputs from a drained work queue")
+    reduce.add_argument('--queue', required=True, help="Shared work queue database")
+    reduce.add_argument('--force', action='store_true',
+                        help="Assemble the outputs even if a worker already did (e.g. after it crashed)")
+    reduce.add_argument('--memory-mb', type=int,
+                        help="Bounded-memory mode: sort streams on disk within this budget")
+    reduce.set_defaults(func=cmd_reduce)
+
+    status = subparsers.add_parser('status', parents=[common], help="Show the state of the output directory")
+    status.add_argument('--queue', help="Also show work queue progress")
+    status.set_defaults(func=cmd_status)
+
+    export = subparsers.add_parser('export', parents=[common, credentials],
+                                   help="Write a playlist from the cached scrape")
+    export.add_argument('-o', '--output', help="Playlist path (default: a new file in output/playlists)")
+    export.set_defaults(func=cmd_export)
+
+    lookup = subparsers.add_parser('lookup', parents=[common], help="Print streams from the snapshot index")
+    lookup.add_argument('-s', '--stream-id', action='append', default=[], help="Stream ID (repeatable)")
+    lookup.add_argument('-c', '--category-id', action='append', default=[],
+                        help="Print every stream of a category (repeatable)")
+    lookup.add_argument('-G', '--generation', type=int, help="Snapshot generation (default: the newest)")
+    lookup.set_defaults(func=cmd_lookup)
+
+    diff = subparsers.add_parser('diff', parents=[common],
+                                 help="List streams added, removed or changed since an older snapshot")
+    diff.add_argument('previous', nargs='?',
+                      help="Older output or snapshot directory (default: the previous generation)")
+    diff.add_argument('-G', '--generation', type=int, help="Newer generation (default: the newest)")
+    diff.add_argument('--json', action='store_true', help="Print the changed records as JSON")
+    diff.set_defaults(func=cmd_diff)
+
+    merge = subparsers.add_parser('merge', parents=[common], help="Merge playlists, highest priority first")
+    merge.add_argument('inputs', nargs='+', help="Playlists to merge")
+    merge.add_argument('-o', '--output', required=True, help="Merged playlist path")
+    merge.add_argument('-g', '--group-order', action='append', default=[],
+                       help="Group name or prefix to place first (repeatable)")
+    merge.add_argument('--keep-duplicates', action='store_true', help="Keep every duplicate entry")
+    merge.add_argument('--memory-mb', type=int, default=64, help="Approximate memory budget in MB")
+    merge.set_defaults(func=cmd_merge)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    """Entry point"""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+External Sort
+Sorts record streams larger than memory by spilling sorted runs to disk
+"""
+
+import heapq
+import json
+import os
+import shutil
+import sys
+import tempfile
+from typing import Callable, Dict, Iterator, List, Optional
+import logging
+
+# Per-entry cost of the buffer beyond the key and line themselves:
+# the (key, line) tuple and the buffer list's pointer to it
+ENTRY_OVERHEAD = sys.getsizeof((None, None)) + 8
+
+
+def entry_size(key: tuple, line: str) -> int:
+    """Approximate memory held by one buffered (key, line) entry"""
+    return sys.getsizeof(line) + sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key) + ENTRY_OVERHEAD
+
+
+class ExternalSorter:
+    def __init__(self, key: Callable[[Dict], list], memory_budget: int = 64 * 1024 * 1024,
+                 temp_dir: str = None, max_fanin: int = 64):
+        """
+        Initialize External Sorter
+
+        Args:
+            key: Function returning the sort key of a record. Keys are stored as
+                 JSON, so they must be built from strings and numbers only
+            memory_budget: Approximate bytes of buffered records (including Python
+                           object overhead) held before spilling a run
+            temp_dir: Directory for run files (a private temp directory by default)
+            max_fanin: Maximum number of runs merged at once
+        """
+        self.key = key
+        self.memory_budget = memory_budget
+        self.max_fanin = max(2, max_fanin)
+        self.run_dir = tempfile.mkdtemp(prefix="sort_runs_", dir=temp_dir)
+        self.runs: List[str] = []
+        self.buffer: List[tuple] = []
+        self.buffer_bytes = 0
+        self.count = 0
+
+    def add(self, record: Dict):
+        """Add a record, spilling the buffer to disk once it exceeds the budget"""
+        # The sequence number keeps the sort stable and avoids comparing records
+        key = (*self.key(record), self.count)
+        line = json.dumps(record, ensure_ascii=False)
+        self.buffer.append((key, line))
+        self.buffer_bytes += entry_size(key, line)
+        self.count += 1
+
+        if self.buffer_bytes >= self.memory_budget:
+            self.spill()
+
+    def extend(self, records):
+        """Add several records"""
+        for record in records:
+            self.add(record)
+
+    def spill(self):
+        """Write the buffered records to disk as one sorted run"""
+        if not self.buffer:
+            return
+        self.buffer.sort(key=lambda item: item[0])
+        run_file = os.path.join(self.run_dir, f"run_{len(self.runs):06d}.jsonl")
+        with open(run_file, 'w', encoding='utf-8') as f:
+            for key, line in self.buffer:
+                f.write(f"[{json.dumps(key, ensure_ascii=False)},{line}]\n")
+        logging.debug("Spilled %s records to %s", len(self.buffer), run_file)
+        self.runs.append(run_file)
+        self.buffer = []
+        self.buffer_bytes = 0
+
+    def read_run(self, run_file: str) -> Iterator[list]:
+        """Yield [key, record] pairs from a run file"""
+        with open(run_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def merge_runs(self, run_files: List[str]) -> Iterator[list]:
+        """K-way merge several sorted runs"""
+        return heapq.merge(*(self.read_run(run) for run in run_files), key=lambda item: item[0])
+
+    def reduce_runs(self):
+        """Merge runs in groups until at most max_fanin remain"""
+        while len(self.runs) > self.max_fanin:
+            merged_runs = []
+            for start in range(0, len(self.runs), self.max_fanin):
+                group = self.runs[start:start + self.max_fanin]
+                run_file = os.path.join(self.run_dir, f"merge_{len(merged_runs):06d}_{os.path.basename(group[0])}")
+                with open(run_file, 'w', encoding='utf-8') as f:
+                    for item in self.merge_runs(group):
+                        f.write(json.dumps(item, ensure_ascii=False))
+                        f.write("\n")
+                for run in group:
+                    os.remove(run)
+                merged_runs.append(run_file)
+            self.runs = merged_runs
+
+    def sorted(self) -> Iterator[Dict]:
+        """Yield all records in key order"""
+        if not self.runs:
+            # Everything fitted in memory, no need to touch the disk
+            self.buffer.sort(key=lambda item: item[0])
+            for _, line in self.buffer:
+                yield json.loads(line)
+            return
+
+        self.spill()
+        self.reduce_runs()
+        for _, record in self.merge_runs(self.runs):
+            yield record
+
+    def __iter__(self) -> Iterator[Dict]:
+        # Iterating again merges the runs again, so the sorter can stand in for a list
+        return self.sorted()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def map(self, function: Callable[[Dict], Dict]) -> 'MappedRecords':
+        """Return a re-iterable view applying a function to each sorted record"""
+        return MappedRecords(self, function)
+
+    def cleanup(self):
+        """Remove all run files"""
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+        self.runs = []
+        self.buffer = []
+        self.buffer_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+
+
+class MappedRecords:
+    """Lazily applies a function to the records of a re-iterable source"""
+
+    def __init__(self, source, function: Callable[[Dict], Dict]):
+        self.source = source
+        self.function = function
+
+    def __iter__(self) -> Iterator[Dict]:
+        return (self.function(record) for record in self.source)
+
+    def __len__(self) -> int:
+        return len(self.source)
+
+    def map(self, function: Callable[[Dict], Dict]) -> 'MappedRecords':
+        return MappedRecords(self, function)
+
+
+def sort_key_text(value: Optional[str]) -> str:
+    """Normalise a text value for use in a sort key"""
+    return (value or '').casefold()
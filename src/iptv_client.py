@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+IPTV Client
+Library API that yields categories and streams lazily, without touching the disk
+
+Example:
+    client = XtreamClient(username, password, server)
+    for stream in client.iter_streams():
+        handle(stream)
+
+    # Writing files is opt-in
+    with M3USink("playlist.m3u") as playlist:
+        for stream in tee(client.iter_streams(), playlist):
+            handle(stream)
+"""
+
+import json
+import time
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
+import logging
+
+USER_AGENT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'application/json, text/plain, */*',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Connection': 'keep-alive'
+}
+
+
+class XtreamClient:
+    def __init__(self, username: str, password: str, server: str, request_delay: float = 3,
+                 max_retries: int = 3, retry_delay: float = 10, timeout: int = 60, session=None):
+        """
+        Initialize Xtream Client
+
+        Args:
+            username: IPTV username
+            password: IPTV password
+            server: IPTV server URL (e.g., http://your-provider.com)
+            request_delay: Seconds to wait between API requests
+            max_retries: Attempts per request
+            retry_delay: Seconds to wait before retrying a failed request
+            timeout: Per-request timeout in seconds
+            session: Optional requests.Session to reuse
+        """
+        self.username = username
+        self.password = password
+        self.server = server.rstrip('/')
+        self.request_delay = request_delay
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self._session = session
+
+    @property
+    def session(self):
+        """HTTP session, created on first use"""
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
+
+    def api_url(self, action: str, **params) -> str:
+        """Build a player_api.php URL"""
+        url = f"{self.server}/player_api.php?username={self.username}&password={self.password}&action={action}"
+        for name, value in params.items():
+            url += f"&{name}={value}"
+        return url
+
+    def build_stream_url(self, stream_id) -> str:
+        """Build stream URL for a given stream ID"""
+        return f"{self.server}/live/{self.username}/{self.password}/{stream_id}.ts"
+
+    def fetch_json(self, url: str, retries: int = None) -> Optional[List[Dict]]:
+        """Fetch a JSON document with retries (no rate limiting delay)"""
+        if retries is None:
+            retries = self.max_retries
+
+        for attempt in range(retries):
+            try:
+                logging.debug("Making request: %s", url.rsplit('action=', 1)[-1])
+                response = self.session.get(url, timeout=self.timeout, headers=USER_AGENT_HEADERS)
+                response.raise_for_status()
+                return response.json()
+            except Exception as e:
+                logging.warning("Request failed (attempt %s/%s): %s", attempt + 1, retries, e)
+                if attempt < retries - 1:
+                    logging.info("Waiting %s seconds before retry...", self.retry_delay)
+                    time.sleep(self.retry_delay)
+        logging.error("All retries failed for action: %s", url.rsplit('action=', 1)[-1])
+        return None
+
+    def normalise_stream(self, stream: Dict, category: Dict) -> Dict:
+        """Attach category details and the playable URL to a stream record"""
+        stream['category_name'] = category.get('category_name', 'Unknown')
+        stream['category_id'] = category.get('category_id')
+        stream['stream_url'] = self.build_stream_url(stream.get('stream_id', ''))
+        return stream
+
+    def iter_categories(self) -> Iterator[Dict]:
+        """Yield live categories"""
+        categories = self.fetch_json(self.api_url('get_live_categories')) or []
+        yield from categories
+
+    def iter_streams(self, categories: Iterable[Dict] = None) -> Iterator[Dict]:
+        """
+        Yield normalised live streams, one category at a time
+
+        Args:
+            categories: Categories to fetch (all categories by default)
+        """
+        if categories is None:
+            categories = self.iter_categories()
+
+        first = True
+        for category in categories:
+            if not first:
+                time.sleep(self.request_delay)
+            first = False
+
+            url = self.api_url('get_live_streams', category_id=category.get('category_id'))
+            for stream in self.fetch_json(url) or []:
+                yield self.normalise_stream(stream, category)
+
+    async def aiter_categories(self) -> AsyncIterator[Dict]:
+        """Async version of iter_categories; requests run in a worker thread"""
+        import asyncio
+
+        categories = await asyncio.to_thread(self.fetch_json, self.api_url('get_live_categories'))
+        for category in categories or []:
+            yield category
+
+    async def aiter_streams(self, categories: Iterable[Dict] = None) -> AsyncIterator[Dict]:
+        """Async version of iter_streams; the event loop is never blocked"""
+        import asyncio
+
+        if categories is None:
+            categories = [category async for category in self.aiter_categories()]
+
+        first = True
+        for category in categories:
+            if not first:
+                await asyncio.sleep(self.request_delay)
+            first = False
+
+            url = self.api_url('get_live_streams', category_id=category.get('category_id'))
+            streams = await asyncio.to_thread(self.fetch_json, url)
+            for stream in streams or []:
+                yield self.normalise_stream(stream, category)
+
+
+class JSONLinesSink:
+    """Writes one JSON record per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, record: Dict):
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write("\n")
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class M3USink:
+    """Writes normalised stream records as an M3U playlist"""
+
+    def __init__(self, path: str, comments: List[str] = None):
+        """
+        Args:
+            path: Playlist file to write
+            comments: Optional comment lines written after the #EXTM3U header
+        """
+        self.path = path
+        self.count = 0
+        self.current_category = None
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write("#EXTM3U\n")
+        if comments:
+            for comment in comments:
+                self._file.write(f"# {comment}\n")
+            self._file.write("\n")
+
+    def write(self, stream: Dict):
+        if stream.get('category_name') != self.current_category:
+            self.current_category = stream.get('category_name')
+            self._file.write(f"\n# {self.current_category}\n")
+
+        stream_name = stream.get('name', 'Unknown')
+        self._file.write(f"#EXTINF:-1 tvg-id=\"{stream.get('stream_id', '')}\" tvg-name=\"{stream_name}\" tvg-logo=\"{stream.get('stream_icon', '')}\" group-title=\"{self.current_category}\",{stream_name}\n")
+        self._file.write(f"{stream['stream_url']}\n")
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def tee(records: Iterable[Dict], *sinks) -> Iterator[Dict]:
+    """Pass records through while writing each one to the given sinks"""
+    for record in records:
+        for sink in sinks:
+            sink.write(record)
+        yield record
+
+
+async def atee(records: AsyncIterator[Dict], *sinks) -> AsyncIterator[Dict]:
+    """Async version of tee"""
+    async for record in records:
+        for sink in sinks:
+            sink.write(record)
+        yield record
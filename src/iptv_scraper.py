@@ -4,8 +4,6 @@ Paid IPTV Scraper
 A comprehensive tool to download M3U playlists from IPTV providers using Xtreme codes
 """
 
-import requests
-import json
 import time
 import os
 import sys
@@ -13,18 +11,12 @@ from datetime import datetime
 from typing import Dict, List, Optional
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('iptv_scraper.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from log_setup import configure_logging
+from storage import DEFAULT_FORMAT, save_data, validate_format
 
 class IPTVScraper:
-    def __init__(self, username: str, password: str, server: str, output_dir: str = "output"):
+    def __init__(self, username: str, password: str, server: str, output_dir: str = "output",
+                 fetch_strategy: str = "api", output_format: str = DEFAULT_FORMAT):
         """
         Initialize IPTV Scraper
         
@@ -33,11 +25,19 @@ class IPTVScraper:
             password: IPTV password  
             server: IPTV server URL (e.g., http://your-provider.com)
             output_dir: Directory to save output files
+            fetch_strategy: "api" to crawl player_api.php, "m3u" to try the
+                            get.php m3u_plus export first
+            output_format: Encoding of the JSON outputs (see storage.FORMATS)
         """
         self.username = username
         self.password = password
         self.server = server.rstrip('/')
         self.output_dir = output_dir
+        self.fetch_strategy = fetch_strategy
+        validate_format(output_format)
+        self.output_format = output_format
+        
+        import requests
         self.session = requests.Session()
         
         # Create output directory
@@ -48,16 +48,18 @@ class IPTVScraper:
         self.max_retries = 5
         self.retry_delay = 5
         
-        logging.info(f"IPTV Scraper initialized for server: {server}")
+        logging.info("IPTV Scraper initialized for server: %s", server)
     
     def make_api_request(self, url: str, retries: int = None) -> Optional[Dict]:
         """Make API request with retry logic and rate limiting"""
+        import requests
+        
         if retries is None:
             retries = self.max_retries
             
         for attempt in range(retries):
             try:
-                logging.debug(f"Making request: {url}")
+                logging.debug("Making request: %s", url)
                 response = self.session.get(url, timeout=30)
                 response.raise_for_status()
                 
@@ -67,12 +69,12 @@ class IPTVScraper:
                 return response.json()
                 
             except requests.exceptions.RequestException as e:
-                logging.warning(f"Request failed (attempt {attempt + 1}/{retries}): {e}")
+                logging.warning("Request failed (attempt %s/%s): %s", attempt + 1, retries, e)
                 if attempt < retries - 1:
-                    logging.info(f"Waiting {self.retry_delay} seconds before retry...")
+                    logging.info("Waiting %s seconds before retry...", self.retry_delay)
                     time.sleep(self.retry_delay)
                 else:
-                    logging.error(f"All retries failed for: {url}")
+                    logging.error("All retries failed for: %s", url)
                     return None
     
     def get_categories(self) -> List[Dict]:
@@ -82,18 +84,18 @@ class IPTVScraper:
         
         categories = self.make_api_request(url)
         if categories:
-            logging.info(f"Found {len(categories)} categories")
+            logging.info("Found %s categories", len(categories))
             return categories
         return []
     
     def get_streams_for_category(self, category_id: str, category_name: str) -> List[Dict]:
         """Get all streams for a specific category"""
-        logging.info(f"Fetching streams for category: {category_name} (ID: {category_id})")
+        logging.info("Fetching streams for category: %s (ID: %s)", category_name, category_id)
         url = f"{self.server}/player_api.php?username={self.username}&password={self.password}&action=get_live_streams&category_id={category_id}"
         
         streams = self.make_api_request(url)
         if streams:
-            logging.info(f"Found {len(streams)} streams in {category_name}")
+            logging.info("Found %s streams in %s", len(streams), category_name)
             return streams
         return []
     
@@ -109,7 +111,7 @@ class IPTVScraper:
         
         filepath = os.path.join(self.output_dir, filename)
         
-        logging.info(f"Creating M3U playlist: {filepath}")
+        logging.info("Creating M3U playlist: %s", filepath)
         
         with open(filepath, 'w', encoding='utf-8') as f:
             # Write M3U header
@@ -133,15 +135,14 @@ class IPTVScraper:
                 f.write(f"#EXTINF:-1 tvg-id=\"{stream.get('stream_id', '')}\" tvg-name=\"{stream_name}\" tvg-logo=\"{stream.get('stream_icon', '')}\" group-title=\"{current_category}\",{stream_name}\n")
                 f.write(f"{stream_url}\n")
         
-        logging.info(f"M3U playlist created successfully: {filepath}")
+        logging.info("M3U playlist created successfully: %s", filepath)
         return filepath
     
     def save_json_data(self, data: Dict, filename: str) -> str:
-        """Save data as JSON file"""
-        filepath = os.path.join(self.output_dir, filename)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        logging.info(f"JSON data saved: {filepath}")
+        """Save data in the configured output format (the .json extension is replaced to match)"""
+        base_path = os.path.join(self.output_dir, os.path.splitext(filename)[0])
+        filepath = save_data(base_path, data, self.output_format)
+        logging.info("JSON data saved: %s", filepath)
         return filepath
     
     def scrape_all_channels(self) -> Dict:
@@ -164,7 +165,7 @@ class IPTVScraper:
             category_id = category.get('category_id')
             category_name = category.get('category_name', 'Unknown')
             
-            logging.info(f"Processing category {i}/{total_categories}: {category_name}")
+            logging.info("Processing category %s/%s: %s", i, total_categories, category_name)
             
             # Get streams for this category
             streams = self.get_streams_for_category(category_id, category_name)
@@ -181,7 +182,7 @@ class IPTVScraper:
                 safe_filename = f"category_{category_id}_{category_name.replace(' ', '_').replace('/', '_')}.json"
                 self.save_json_data(streams, safe_filename)
             
-            logging.info(f"Total streams collected so far: {len(all_streams)}")
+            logging.info("Total streams collected so far: %s", len(all_streams))
         
         # Save complete data
         complete_data = {
@@ -196,7 +197,53 @@ class IPTVScraper:
         
         self.save_json_data(complete_data, "complete_data.json")
         
-        logging.info(f"Scraping completed! Total streams: {len(all_streams)}")
+        logging.info("Scraping completed! Total streams: %s", len(all_streams))
+        return complete_data
+    
+    def scrape_from_export(self) -> Dict:
+        """Scrape all channels from the get.php m3u_plus export in a single download"""
+        from m3u_export import ExportUnavailable, build_export_url, download_export, streams_from_export
+        
+        logging.info("Fetching channels from the m3u_plus export...")
+        export_file = os.path.join(self.output_dir, "provider_export.m3u")
+        url = build_export_url(self.server, self.username, self.password)
+        
+        try:
+            size = download_export(self.session, url, export_file, timeout=120)
+            logging.info("Downloaded export (%s bytes): %s", size, export_file)
+            # One request for the real category IDs, so records match an API crawl
+            categories, all_streams = streams_from_export(export_file, self.get_categories())
+        except ExportUnavailable as e:
+            logging.warning("m3u_plus export unavailable: %s", e)
+            return {}
+        
+        # Feed the same outputs as the API crawl (the category list is kept apart
+        # from categories.json, since groups it does not know get m3u_N IDs)
+        self.save_json_data(categories, "export_categories.json")
+        
+        category_streams = {}
+        for stream in all_streams:
+            category_streams.setdefault(stream['category_id'], []).append(stream)
+        for category in categories:
+            category_id = category['category_id']
+            category_name = category['category_name']
+            if category_id in category_streams:
+                safe_filename = f"category_{category_id}_{category_name.replace(' ', '_').replace('/', '_')}.json"
+                self.save_json_data(category_streams[category_id], safe_filename)
+        
+        complete_data = {
+            'server': self.server,
+            'username': self.username,
+            'scrape_date': datetime.now().isoformat(),
+            'total_categories': len(categories),
+            'total_streams': len(all_streams),
+            'categories': categories,
+            'streams': all_streams
+        }
+        
+        self.save_json_data(complete_data, "complete_data.json")
+        
+        logging.info("Export scrape completed! Total streams: %s", len(all_streams))
         return complete_data
     
     def run(self) -> str:
@@ -206,7 +253,13 @@ class IPTVScraper:
         logging.info("=" * 50)
         
         # Scrape all channels
-        data = self.scrape_all_channels()
+        data = None
+        if self.fetch_strategy == "m3u":
+            data = self.scrape_from_export()
+            if not data:
+                logging.info("Falling back to the player_api.php crawl")
+        if not data:
+            data = self.scrape_all_channels()
         
         if not data or not data.get('streams'):
             logging.error("No streams found!")
@@ -217,25 +270,29 @@ class IPTVScraper:
         
         logging.info("=" * 50)
         logging.info("IPTV SCRAPER COMPLETED")
-        logging.info(f"M3U Playlist: {m3u_file}")
-        logging.info(f"Total Channels: {len(data['streams'])}")
-        logging.info(f"Total Categories: {len(data['categories'])}")
+        logging.info("M3U Playlist: %s", m3u_file)
+        logging.info("Total Channels: %s", len(data['streams']))
+        logging.info("Total Categories: %s", len(data['categories']))
         logging.info("=" * 50)
         
         return m3u_file
 
 def main():
     """Main function for command line usage"""
-    if len(sys.argv) != 4:
-        print("Usage: python3 iptv_scraper.py <username> <password> <server>")
+    if len(sys.argv) not in (4, 5) or (len(sys.argv) == 5 and sys.argv[4] not in ("api", "m3u")):
+        print("Usage: python3 iptv_scraper.py <username> <password> <server> [api|m3u]")
         print("Example: python3 iptv_scraper.py your_username your_password http://your-provider.com")
         sys.exit(1)
     
+    configure_logging('iptv_scraper.log')
+    
     username = sys.argv[1]
     password = sys.argv[2]
     server = sys.argv[3]
     
-    scraper = IPTVScraper(username, password, server)
+    fetch_strategy = sys.argv[4] if len(sys.argv) == 5 else "api"
+    
+    scraper = IPTVScraper(username, password, server, fetch_strategy=fetch_strategy)
     m3u_file = scraper.run()
     
     if m3u_file:
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Logging Setup
+Non-blocking logging for the application entry points
+
+Log calls only put records on an in-memory queue; a background listener
+thread formats them and writes them to the console and log files, so slow
+disks or terminals never stall fetch threads.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime
+from typing import Optional
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_lock = threading.Lock()
+_queue_handler = None
+_listener = None
+_handlers = []
+_json_format = False
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in STANDARD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves formatting to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now, since they may change before the listener
+        # runs, but keep exc_info so the real handlers can format it
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def make_formatter() -> logging.Formatter:
+    """Return a formatter for the configured output style"""
+    return JSONFormatter() if _json_format else logging.Formatter(LOG_FORMAT)
+
+
+def _restart_listener():
+    """(Re)start the listener thread with the current set of handlers"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        for handler in _handlers:
+            handler.close()
+
+
+def configure_logging(log_file: str = None, level: Optional[int] = logging.INFO, console: bool = True,
+                      json_format: bool = None):
+    """
+    Configure root logging for the command line entry points
+
+    Safe to call repeatedly: the queue handler is installed once, and a log
+    file is only added if it is not already being written to.
+
+    Args:
+        log_file: Optional path of a log file to write to
+        level: Root logging level (None leaves it as it is)
+        console: Also log to stdout
+        json_format: Write JSON records (default: the IPTV_LOG_JSON environment variable)
+    """
+    global _queue_handler, _listener, _json_format
+
+    with _lock:
+        root = logging.getLogger()
+        if level is not None:
+            root.setLevel(level)
+
+        if json_format is None:
+            json_format = os.environ.get('IPTV_LOG_JSON', '').lower() in ('1', 'true', 'yes')
+
+        changed = False
+        if _queue_handler is None:
+            _queue_handler = BackgroundQueueHandler(queue.SimpleQueue())
+            root.addHandler(_queue_handler)
+            atexit.register(shutdown_logging)
+            changed = True
+
+        if json_format != _json_format:
+            if _listener is not None:
+                # Flush records queued under the old format first
+                _listener.stop()
+                _listener = None
+            _json_format = json_format
+            for handler in _handlers:
+                handler.setFormatter(make_formatter())
+            changed = True
+
+        if console and not any(getattr(handler, '_console', False) for handler in _handlers):
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(make_formatter())
+            handler._console = True
+            _handlers.append(handler)
+            changed = True
+
+        if log_file:
+            log_file = os.path.abspath(log_file)
+            if not any(getattr(handler, 'baseFilename', None) == log_file for handler in _handlers):
+                os.makedirs(os.path.dirname(log_file), exist_ok=True)
+                handler = logging.FileHandler(log_file, encoding='utf-8')
+                handler.setFormatter(make_formatter())
+                _handlers.append(handler)
+                changed = True
+
+        if changed or _listener is None:
+            _restart_listener()
+
+
+def add_log_file(log_file: str):
+    """
+    Also write logs to a file (no-op if it is already being written to)
+
+    Never adds a console handler or changes the root level: either the entry
+    point already set them up with configure_logging(), or the scraper is
+    embedded and the host application owns them. Call this before the first
+    log record, otherwise logging falls back to basicConfig() and installs
+    its own stderr handler.
+    """
+    with _lock:
+        json_format = _json_format if _queue_handler is not None else None
+    configure_logging(log_file, level=None, console=False, json_format=json_format)
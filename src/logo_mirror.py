@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Logo Mirror
+Downloads channel logos concurrently into a content-addressed local cache
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+import requests
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, only needed for resizing
+    Image = None
+
+# Map content types to file extensions for stored logos
+CONTENT_TYPE_EXTENSIONS = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/svg+xml': '.svg',
+    'image/x-icon': '.ico',
+    'image/vnd.microsoft.icon': '.ico',
+}
+
+
+class LogoMirror:
+    def __init__(self, mirror_dir: str, base_url: str = None, max_workers: int = 8,
+                 timeout: int = 20, resize: int = None):
+        """
+        Initialize Logo Mirror
+
+        Args:
+            mirror_dir: Directory holding the mirrored logos and cache index
+            base_url: Public URL the mirror directory is served from. When not
+                      set, playlists reference the local file paths instead
+            max_workers: Maximum number of concurrent downloads
+            timeout: Per-request timeout in seconds
+            resize: Optional maximum width/height in pixels (requires Pillow)
+        """
+        self.mirror_dir = mirror_dir
+        self.objects_dir = os.path.join(mirror_dir, "objects")
+        self.index_file = os.path.join(mirror_dir, "logo_index.json")
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.resize = resize
+
+        if resize and Image is None:
+            logging.warning("Pillow is not installed, logos will be mirrored without resizing")
+            self.resize = None
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        self.index = self.load_index()
+        self._index_lock = threading.Lock()
+        self._local = threading.local()
+
+    def load_index(self) -> Dict:
+        """Load the URL -> cached object index from disk"""
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                for entry in index.values():
+                    # Older indexes stored paths relative to the working directory
+                    path = entry['path'].replace(os.sep, '/')
+                    if not path.startswith('objects/') and '/objects/' in path:
+                        entry['path'] = path[path.rindex('/objects/') + 1:]
+                return index
+            except Exception as e:
+                logging.warning("Failed to load logo index: %s", e)
+        return {}
+
+    def save_index(self):
+        """Persist the cache index atomically"""
+        tmp_file = self.index_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False)
+        os.replace(tmp_file, self.index_file)
+
+    def get_session(self) -> requests.Session:
+        """Return a per-thread HTTP session (sessions are not thread safe)"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            self._local.session = session
+        return session
+
+    def object_path(self, digest: str, extension: str) -> str:
+        """Return the storage path for a content hash, sharded by prefix, relative to mirror_dir"""
+        return f"objects/{digest[:2]}/{digest}{extension}"
+
+    def resolve_path(self, path: str) -> str:
+        """Return the file system path of a stored object"""
+        return os.path.join(self.mirror_dir, *path.split('/'))
+
+    def guess_extension(self, url: str, content_type: str) -> str:
+        """Pick a file extension from the response content type or URL"""
+        content_type = (content_type or '').split(';')[0].strip().lower()
+        if content_type in CONTENT_TYPE_EXTENSIONS:
+            return CONTENT_TYPE_EXTENSIONS[content_type]
+        extension = os.path.splitext(url.split('?')[0])[1].lower()
+        if extension in CONTENT_TYPE_EXTENSIONS.values():
+            return extension
+        return '.img'
+
+    def resize_image(self, content: bytes, extension: str) -> Tuple[bytes, str]:
+        """Shrink an image so that it fits within the configured size"""
+        if not self.resize or extension in ('.svg', '.ico'):
+            return content, extension
+        try:
+            with Image.open(io.BytesIO(content)) as image:
+                if max(image.size) <= self.resize:
+                    return content, extension
+                image.thumbnail((self.resize, self.resize))
+                if image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGBA')
+                buffer = io.BytesIO()
+                image.save(buffer, format='PNG', optimize=True)
+                return buffer.getvalue(), '.png'
+        except Exception as e:
+            logging.debug("Could not resize logo, keeping original: %s", e)
+            return content, extension
+
+    def store_object(self, content: bytes, extension: str) -> str:
+        """Store content under its hash and return the hash"""
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.resolve_path(self.object_path(digest, extension))
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return digest
+
+    def fetch_logo(self, url: str) -> Optional[Dict]:
+        """Download one logo, revalidating against the cached copy if present"""
+        with self._index_lock:
+            cached = self.index.get(url)
+
+        headers = {}
+        if cached and os.path.exists(self.resolve_path(cached['path'])):
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        else:
+            cached = None
+
+        try:
+            response = self.get_session().get(url, timeout=self.timeout, headers=headers)
+            if response.status_code == 304 and cached:
+                logging.debug("Logo not modified: %s", url)
+                return cached
+            response.raise_for_status()
+            if not response.content:
+                raise ValueError("empty response body")
+        except Exception as e:
+            logging.debug("Failed to mirror logo %s: %s", url, e)
+            # A stale copy is better than a dead link
+            return cached
+
+        extension = self.guess_extension(url, response.headers.get('Content-Type'))
+        content, extension = self.resize_image(response.content, extension)
+        digest = self.store_object(content, extension)
+
+        return {
+            'sha256': digest,
+            'path': self.object_path(digest, extension),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched': datetime.now().isoformat(),
+        }
+
+    def mirror(self, urls: Iterable[str]) -> Dict[str, str]:
+        """
+        Mirror all distinct logo URLs concurrently
+
+        Returns:
+            Mapping of original logo URL to its mirrored location
+        """
+        unique_urls = sorted({url for url in urls if url and url.startswith(('http://', 'https://'))})
+        logging.info("Mirroring %s distinct logos with %s workers", len(unique_urls), self.max_workers)
+
+        mirrored = 0
+        failed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetch_logo, url): url for url in unique_urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                entry = future.result()
+                if entry:
+                    with self._index_lock:
+                        self.index[url] = entry
+                    mirrored += 1
+                else:
+                    # No usable copy (the object may have been deleted): keep the provider URL
+                    with self._index_lock:
+                        self.index.pop(url, None)
+                    failed += 1
+
+        self.save_index()
+        logging.info("Logo mirroring finished: %s available, %s failed", mirrored, failed)
+
+        return {url: self.public_location(self.index[url]) for url in unique_urls if url in self.index}
+
+    def public_location(self, entry: Dict) -> str:
+        """Return the location a playlist should use for a cached logo"""
+        if self.base_url:
+            return f"{self.base_url}/{entry['path']}"
+        return os.path.abspath(self.resolve_path(entry['path']))
+
+    def rewrite_streams(self, streams: List[Dict]) -> List[Dict]:
+        """Return copies of the streams with stream_icon pointing at the mirror"""
+        locations = self.mirror(stream.get('stream_icon') for stream in streams)
+        return [self.relocate(stream, locations) for stream in streams]
+
+    @staticmethod
+    def relocate(stream: Dict, locations: Dict[str, str]) -> Dict:
+        """Return the stream with its icon replaced by the mirrored location, if any"""
+        icon = stream.get('stream_icon')
+        if icon in locations:
+            return dict(stream, stream_icon=locations[icon])
+        return stream
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+M3U Export
+Fetches a provider's get.php m3u_plus export and converts it to stream records
+"""
+
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import logging
+
+from m3u_parser import iter_m3u
+
+STREAM_ID_RE = re.compile(r'/(\d+)(?:\.[A-Za-z0-9]+)?$')
+
+# Groups the API category list does not know get IDs with this prefix; the
+# API does not accept them, so they must never end up in its category cache
+SYNTHETIC_CATEGORY_PREFIX = "m3u_"
+
+
+def is_synthetic_category(category: Dict) -> bool:
+    """True for a category invented from an export group rather than returned by the API"""
+    return str(category.get('category_id', '')).startswith(SYNTHETIC_CATEGORY_PREFIX)
+
+
+class ExportUnavailable(Exception):
+    """Raised when the m3u_plus export is disabled, invalid or truncated"""
+
+
+def build_export_url(server: str, username: str, password: str) -> str:
+    """Build the get.php m3u_plus export URL"""
+    return f"{server}/get.php?username={username}&password={password}&type=m3u_plus&output=ts"
+
+
+def download_export(session, url: str, dest_path: str,
+                    headers: Dict = None, timeout: int = 60) -> int:
+    """
+    Stream the export body straight to disk
+
+    Returns:
+        Number of bytes written
+
+    Raises:
+        ExportUnavailable: If the export is disabled or the download is incomplete
+    """
+    import requests
+
+    tmp_path = dest_path + ".part"
+    written = 0
+    try:
+        with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            expected = response.headers.get('Content-Length')
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=256 * 1024):
+                    if not written and not chunk.lstrip(b'\xef\xbb\xbf \r\n\t').startswith(b'#EXTM3U'):
+                        raise ExportUnavailable("response is not an M3U playlist (export disabled?)")
+                    f.write(chunk)
+                    written += len(chunk)
+        if not written:
+            raise ExportUnavailable("export returned an empty body")
+        encoding = response.headers.get('Content-Encoding')
+        if expected and not encoding and int(expected) != written:
+            raise ExportUnavailable(f"export truncated: {written} of {expected} bytes received")
+    except requests.exceptions.RequestException as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise ExportUnavailable(f"export download failed: {e}")
+    except ExportUnavailable:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, dest_path)
+    return written
+
+
+def check_complete(path: str):
+    """Raise ExportUnavailable if the export ends in the middle of an entry"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        lines = [line.strip() for line in f.read().splitlines() if line.strip()]
+    if not lines or lines[-1].startswith(b'#EXTINF'):
+        raise ExportUnavailable("export ends with an incomplete entry")
+
+
+def stream_type_from_url(url: str) -> str:
+    """Classify an export URL as live, movie or series"""
+    path = urlsplit(url).path
+    if '/movie/' in path:
+        return 'movie'
+    if '/series/' in path:
+        return 'series'
+    return 'live'
+
+
+def streams_from_export(path: str, categories: Optional[List[Dict]] = None) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Convert a downloaded export into category and stream records
+
+    The records mirror the player_api.php get_live_streams shape so they can be
+    fed to the existing JSON and playlist outputs. Only live streams are kept.
+
+    Args:
+        path: Downloaded export file
+        categories: Known categories, used to map group names to category IDs
+
+    Returns:
+        (categories, streams) in export order
+    """
+    check_complete(path)
+
+    known_ids = {category.get('category_name'): category.get('category_id') for category in (categories or [])}
+    seen_categories = {}
+    streams = []
+
+    for entry in iter_m3u(path):
+        if stream_type_from_url(entry['url']) != 'live':
+            continue
+
+        group = entry['group'] or 'Uncategorized'
+        if group not in seen_categories:
+            category_id = known_ids.get(group) or f"{SYNTHETIC_CATEGORY_PREFIX}{len(seen_categories) + 1}"
+            seen_categories[group] = {'category_id': category_id, 'category_name': group, 'parent_id': 0}
+        category = seen_categories[group]
+
+        attrs = entry['attrs']
+        match = STREAM_ID_RE.search(urlsplit(entry['url']).path)
+        streams.append({
+            'num': len(streams) + 1,
+            'name': entry['name'] or attrs.get('tvg-name', 'Unknown'),
+            'stream_type': 'live',
+            'stream_id': int(match.group(1)) if match else entry['url'],
+            'stream_icon': attrs.get('tvg-logo', ''),
+            'epg_channel_id': attrs.get('tvg-id') or None,
+            'category_id': category['category_id'],
+            'category_name': group,
+        })
+
+    if not streams:
+        raise ExportUnavailable("export contains no live streams")
+
+    logging.info("Parsed %s live streams in %s categories from export", len(streams), len(seen_categories))
+    return list(seen_categories.values()), streams
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+M3U Merge
+Combines several M3U playlists into one master list in bounded memory
+"""
+
+import argparse
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from external_sort import ExternalSorter, sort_key_text
+from log_setup import configure_logging
+from m3u_parser import iter_m3u, write_m3u_entry
+import logging
+
+
+def group_rank(group: str, group_order: List[str]) -> int:
+    """Return the position of a group in the preferred order (unlisted groups last)"""
+    folded = sort_key_text(group)
+    for rank, preferred in enumerate(group_order):
+        if folded == preferred or folded.startswith(preferred):
+            return rank
+    return len(group_order)
+
+
+def merge_playlists(inputs: List[str], output_path: str, group_order: Optional[List[str]] = None,
+                    dedupe: bool = True, memory_budget: int = 64 * 1024 * 1024,
+                    temp_dir: str = None) -> Dict:
+    """
+    Merge playlists into one, ordered by group and channel name
+
+    Inputs are listed in priority order: when dedupe is enabled and the same
+    channel name appears in the same group more than once, the entry from the
+    earliest input wins.
+
+    Args:
+        inputs: Playlist paths, highest priority first
+        output_path: Path of the merged playlist
+        group_order: Group names (or name prefixes) to place first, in order
+        dedupe: Drop lower priority duplicates of a channel within a group
+        memory_budget: Approximate bytes of entries held in memory while sorting
+        temp_dir: Directory for temporary sort runs
+
+    Returns:
+        Statistics about the merge
+    """
+    group_order = [sort_key_text(group) for group in (group_order or [])]
+
+    def merge_key(entry: Dict) -> list:
+        return [
+            group_rank(entry['group'], group_order),
+            sort_key_text(entry['group']),
+            sort_key_text(entry['name']),
+            entry['priority'],
+        ]
+
+    stats = {'inputs': len(inputs), 'read': 0, 'written': 0, 'duplicates': 0, 'groups': 0}
+
+    with ExternalSorter(merge_key, memory_budget=memory_budget, temp_dir=temp_dir) as sorter:
+        for priority, path in enumerate(inputs):
+            logging.info("Reading playlist %s/%s: %s", priority + 1, len(inputs), path)
+            for entry in iter_m3u(path):
+                entry['priority'] = priority
+                sorter.add(entry)
+                stats['read'] += 1
+
+        logging.info("Writing merged playlist: %s", output_path)
+        tmp_path = output_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("#EXTM3U\n")
+            f.write(f"# Merged by M3U Merge on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"# Sources: {len(inputs)}\n\n")
+
+            current_group = None
+            last_channel = None
+            for entry in sorter.sorted():
+                channel = (sort_key_text(entry['group']), sort_key_text(entry['name']))
+                if dedupe and channel == last_channel:
+                    stats['duplicates'] += 1
+                    continue
+                last_channel = channel
+
+                if entry['group'] != current_group:
+                    current_group = entry['group']
+                    stats['groups'] += 1
+                    f.write(f"\n# {current_group}\n")
+
+                write_m3u_entry(f, entry)
+                stats['written'] += 1
+        os.replace(tmp_path, output_path)
+
+    logging.info("Merge completed: %s entries written, %s duplicates dropped",
+                 stats['written'], stats['duplicates'])
+    return stats
+
+
+def main():
+    """Main function for command line usage"""
+    parser = argparse.ArgumentParser(description="Merge M3U playlists (highest priority first)")
+    parser.add_argument('inputs', nargs='+', help="Playlists to merge, highest priority first")
+    parser.add_argument('-o', '--output', required=True, help="Merged playlist path")
+    parser.add_argument('-g', '--group-order', action='append', default=[],
+                        help="Group name or prefix to place first (repeatable)")
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help="Keep every entry instead of the highest priority one")
+    parser.add_argument('--memory-mb', type=int, default=64,
+                        help="Approximate memory budget for sorting in MB")
+    args = parser.parse_args()
+
+    configure_logging()
+
+    stats = merge_playlists(args.inputs, args.output, group_order=args.group_order,
+                            dedupe=not args.keep_duplicates,
+                            memory_budget=args.memory_mb * 1024 * 1024)
+    print(f"\n✅ Merged {stats['inputs']} playlists into {args.output} ({stats['written']} channels)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+M3U Parser
+Streaming reader and writer for M3U / M3U Plus playlists
+"""
+
+import mmap
+import os
+import re
+from typing import Dict, IO, Iterable, Iterator, Optional, Union
+import logging
+
+# Files at least this large are read through mmap instead of buffered IO
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+EXTINF_RE = re.compile(r'^#EXTINF:\s*(-?\d+(?:\.\d+)?)?\s*(.*)$')
+ATTRIBUTE_RE = re.compile(r'\s*([A-Za-z0-9_-]+)="([^"]*)"')
+
+
+def parse_extinf(line: str) -> Dict:
+    """Parse an #EXTINF line into duration, attributes and display name"""
+    match = EXTINF_RE.match(line)
+    if not match:
+        return {'duration': -1, 'attrs': {}, 'name': ''}
+
+    duration = match.group(1) or '-1'
+    rest = match.group(2)
+
+    attrs = {}
+    position = 0
+    while True:
+        attribute = ATTRIBUTE_RE.match(rest, position)
+        if not attribute:
+            break
+        attrs[attribute.group(1)] = attribute.group(2)
+        position = attribute.end()
+
+    # The display name follows the first comma after the attributes
+    remainder = rest[position:]
+    name = remainder.split(',', 1)[1].strip() if ',' in remainder else remainder.strip()
+
+    return {
+        'duration': float(duration) if '.' in duration else int(duration),
+        'attrs': attrs,
+        'name': name,
+    }
+
+
+def iter_lines(source: Union[str, IO, Iterable], use_mmap: Optional[bool] = None) -> Iterator[str]:
+    """Yield decoded lines from a path, file object or iterable of lines"""
+    if isinstance(source, (str, os.PathLike)):
+        if use_mmap is None:
+            use_mmap = os.path.getsize(source) >= MMAP_THRESHOLD
+        with open(source, 'rb') as f:
+            if use_mmap and os.fstat(f.fileno()).st_size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    for raw in iter(mapped.readline, b''):
+                        yield raw.decode('utf-8', errors='replace')
+            else:
+                for raw in f:
+                    yield raw.decode('utf-8', errors='replace')
+        return
+
+    for raw in source:
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8', errors='replace')
+        yield raw
+
+
+def iter_m3u(source: Union[str, IO, Iterable], use_mmap: Optional[bool] = None) -> Iterator[Dict]:
+    """
+    Stream entries from an M3U / M3U Plus playlist
+
+    Args:
+        source: Path to a playlist, an open file or any iterable of lines
+        use_mmap: Force mmap on or off for paths (default: by file size)
+
+    Yields:
+        Dicts with 'name', 'url', 'duration', 'group' and the EXTINF 'attrs'
+    """
+    pending = None
+    group = None
+
+    for line in iter_lines(source, use_mmap):
+        line = line.strip().lstrip('\ufeff')
+        if not line:
+            continue
+
+        if line.startswith('#EXTINF:'):
+            if pending is not None:
+                logging.debug("EXTINF without URL skipped: %s", pending['name'])
+            pending = parse_extinf(line)
+            group = None
+        elif line.startswith('#EXTGRP:'):
+            group = line[len('#EXTGRP:'):].strip()
+        elif line.startswith('#'):
+            continue
+        elif pending is not None:
+            pending['url'] = line
+            pending['group'] = pending['attrs'].get('group-title') or group or ''
+            yield pending
+            pending = None
+            group = None
+
+
+def format_extinf(entry: Dict) -> str:
+    """Build the #EXTINF line for an entry"""
+    attributes = ''.join(
+        f' {name}="{str(value).replace(chr(34), chr(39))}"'
+        for name, value in entry.get('attrs', {}).items()
+    )
+    return f"#EXTINF:{entry.get('duration', -1)}{attributes},{entry.get('name', '')}"
+
+
+def write_m3u_entry(f: IO, entry: Dict):
+    """Write one entry in the format produced by iter_m3u"""
+    f.write(format_extinf(entry))
+    f.write("\n")
+    if entry.get('group') and 'group-title' not in entry.get('attrs', {}):
+        f.write(f"#EXTGRP:{entry['group']}\n")
+    f.write(f"{entry['url']}\n")
@@ -15,22 +15,10 @@ import logging
 # Add src directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-# Import our scraper
-from robust_iptv_scraper import RobustIPTVScraper
+from log_setup import configure_logging
 
-# Ensure logs directory exists
-logs_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
-os.makedirs(logs_dir, exist_ok=True)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(logs_dir, 'iptv_scraper.log')),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Project-level logs directory
+LOGS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
 
 class M3UScraperApp:
     def __init__(self):
@@ -44,7 +32,7 @@ class M3UScraperApp:
                 with open(self.config_file, 'r') as f:
                     return json.load(f)
             except Exception as e:
-                logging.warning(f"Failed to load config: {e}")
+                logging.warning("Failed to load config: %s", e)
         return {}
     
     def save_credentials(self, username: str, password: str, server: str):
@@ -61,7 +49,7 @@ class M3UScraperApp:
                 json.dump(config, f, indent=2)
             logging.info("Credentials saved (password not stored for security)")
         except Exception as e:
-            logging.warning(f"Failed to save config: {e}")
+            logging.warning("Failed to save config: %s", e)
     
     def print_banner(self):
         """Print application banner"""
@@ -149,6 +137,8 @@ class M3UScraperApp:
             print(f"   Username: {username}")
             print("=" * 50)
             
+            from robust_iptv_scraper import RobustIPTVScraper
+            
             # Initialize scraper with output directory
             output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'output')
             scraper = RobustIPTVScraper(username, password, server, output_dir=output_dir)
@@ -171,11 +161,12 @@ class M3UScraperApp:
             sys.exit(0)
         except Exception as e:
             print(f"\n❌ An error occurred: {e}")
-            logging.error(f"Application error: {e}", exc_info=True)
+            logging.error("Application error: %s", e, exc_info=True)
             sys.exit(1)
 
 def main():
     """Entry point"""
+    configure_logging(os.path.join(LOGS_DIR, 'iptv_scraper.log'))
     app = M3UScraperApp()
     app.run()
 
@@ -4,7 +4,6 @@ Robust IPTV Scraper
 Handles connection issues and builds complete M3U playlists
 """
 
-import requests
 import json
 import time
 import os
@@ -13,38 +12,72 @@ from datetime import datetime
 from typing import Dict, List, Optional
 import logging
 
-# Configure logging - will be updated in __init__ method
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from log_setup import add_log_file, configure_logging
+from storage import DEFAULT_FORMAT, load_named, save_data, validate_format
 
 class RobustIPTVScraper:
-    def __init__(self, username: str, password: str, server: str, output_dir: str = "output"):
+    def __init__(self, username: str, password: str, server: str, output_dir: str = "output",
+                 mirror_logos: bool = False, logo_base_url: str = None,
+                 logo_workers: int = 8, logo_size: int = None, fetch_strategy: str = "api",
+                 queue_path: str = None, worker_id: str = None, output_format: str = DEFAULT_FORMAT,
+                 write_category_files: bool = True, memory_budget_mb: int = None):
         self.username = username
         self.password = password
         self.server = server.rstrip('/')
         self.output_dir = output_dir
-        self.session = requests.Session()
         
-        # More conservative rate limiting
-        self.request_delay = 3  # seconds between requests
-        self.max_retries = 3
-        self.retry_delay = 10
+        import requests
+        from iptv_client import XtreamClient
+        
+        # More conservative rate limiting: 3 seconds between requests, 10 before a retry
+        self.client = XtreamClient(username, password, server, request_delay=3, max_retries=3,
+                                   retry_delay=10, timeout=60, session=requests.Session())
+        self.session = self.client.session
+        
+        # Encoding of the JSON outputs (see storage.FORMATS)
+        validate_format(output_format)
+        self.output_format = output_format
+        # Per-category files repeat every stream already in complete_data
+        self.write_category_files = write_category_files
+        
+        # Bounded-memory mode: spill streams to disk and sort them externally
+        self.memory_budget_mb = memory_budget_mb
+        self.sorter = None
+        
+        # Append-only record file and offset index of the scraped streams
+        self.snapshot = None
+        
+        if memory_budget_mb and output_format == 'parquet':
+            raise ValueError("parquet output needs the whole stream table in memory, "
+                             "choose a JSON based format for bounded-memory mode")
+        if memory_budget_mb and fetch_strategy == 'm3u':
+            raise ValueError("the m3u_plus export is parsed in memory, "
+                             "use the api strategy for bounded-memory mode")
+        
+        # "api" crawls player_api.php, "m3u" tries the get.php export first
+        self.fetch_strategy = fetch_strategy
+        
+        # Optional shared work queue so several workers can split the categories
+        self.work_queue = None
+        self.worker_id = worker_id
+        if queue_path:
+            from work_queue import CategoryWorkQueue, default_worker_id
+            self.work_queue = CategoryWorkQueue(queue_path)
+            self.worker_id = worker_id or default_worker_id()
+        self.queue_poll_interval = 15
+        # Worker that assembles a shared scrape's outputs, when it is not this one
+        self.reduced_by = None
+        
+        # Optional logo mirroring
+        self.mirror_logos = mirror_logos
+        self.logo_base_url = logo_base_url
+        self.logo_workers = logo_workers
+        self.logo_size = logo_size
         
         # Create organized output directory structure
         self.create_output_structure()
         
-        # Configure logging to use organized logs directory
-        log_file = os.path.join(self.logs_dir, 'iptv_scraper.log')
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-        logging.getLogger().addHandler(file_handler)
-        
-        logging.info(f"Robust IPTV Scraper initialized for server: {server}")
+        logging.info("Robust IPTV Scraper initialized for server: %s", server)
     
     def create_output_structure(self):
         """Create organized output directory structure"""
@@ -56,6 +89,8 @@ class RobustIPTVScraper:
         self.streams_dir = os.path.join(self.output_dir, "streams")
         self.playlists_dir = os.path.join(self.output_dir, "playlists")
         self.logs_dir = os.path.join(self.output_dir, "logs")
+        self.logos_dir = os.path.join(self.output_dir, "logos")
+        self.snapshot_dir = os.path.join(self.output_dir, "snapshot")
         
         # Create subdirectories
         os.makedirs(self.categories_dir, exist_ok=True)
@@ -63,55 +98,40 @@ class RobustIPTVScraper:
         os.makedirs(self.playlists_dir, exist_ok=True)
         os.makedirs(self.logs_dir, exist_ok=True)
         
-        logging.info(f"Created organized output structure in: {self.output_dir}")
+        # Attach the log file before anything is logged (see add_log_file)
+        add_log_file(os.path.join(self.logs_dir, 'iptv_scraper.log'))
+        
+        logging.info("Created organized output structure in: %s", self.output_dir)
     
     def make_api_request(self, url: str, retries: int = None) -> Optional[Dict]:
         """Make API request with conservative retry logic"""
-        if retries is None:
-            retries = self.max_retries
-            
-        for attempt in range(retries):
-            try:
-                logging.debug(f"Making request: {url}")
-                
-                # Add headers to look more like a browser
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                    'Accept': 'application/json, text/plain, */*',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'Connection': 'keep-alive'
-                }
-                
-                response = self.session.get(url, timeout=60, headers=headers)
-                response.raise_for_status()
-                
-                # Rate limiting
-                time.sleep(self.request_delay)
-                
-                return response.json()
-                
-            except Exception as e:
-                logging.warning(f"Request failed (attempt {attempt + 1}/{retries}): {e}")
-                if attempt < retries - 1:
-                    logging.info(f"Waiting {self.retry_delay} seconds before retry...")
-                    time.sleep(self.retry_delay)
-                else:
-                    logging.error(f"All retries failed for: {url}")
-                    return None
+        data = self.client.fetch_json(url, retries)
+        if data is not None:
+            # Rate limiting
+            time.sleep(self.client.request_delay)
+        return data
     
     def load_existing_categories(self) -> List[Dict]:
         """Load categories from existing file if available"""
-        categories_file = os.path.join(self.categories_dir, 'categories.json')
-        if os.path.exists(categories_file):
-            try:
-                with open(categories_file, 'r', encoding='utf-8') as f:
-                    categories = json.load(f)
-                logging.info(f"Loaded {len(categories)} categories from existing file")
-                return categories
-            except Exception as e:
-                logging.warning(f"Failed to load existing categories: {e}")
+        from m3u_export import is_synthetic_category
+        
+        try:
+            categories = load_named(os.path.join(self.categories_dir, 'categories'), default=[])
+            if any(is_synthetic_category(category) for category in categories):
+                # Written by an earlier export scrape; the API rejects these IDs
+                logging.warning("Ignoring cached categories with export-derived IDs")
+                return []
+            if categories:
+                logging.info("Loaded %s categories from existing file", len(categories))
+            return categories
+        except Exception as e:
+            logging.warning("Failed to load existing categories: %s", e)
         return []
     
+    def save_categories(self, categories: List[Dict]) -> str:
+        """Save the category list for future runs"""
+        return save_data(os.path.join(self.categories_dir, 'categories'), categories, self.output_format)
+    
     def get_categories(self) -> List[Dict]:
         """Get all channel categories"""
         # Try to load existing data first
@@ -121,98 +141,116 @@ class RobustIPTVScraper:
         
         # If no existing data, fetch from API
         logging.info("Fetching channel categories from API...")
-        url = f"{self.server}/player_api.php?username={self.username}&password={self.password}&action=get_live_categories"
+        url = self.client.api_url('get_live_categories')
         
         categories = self.make_api_request(url)
         if categories:
-            logging.info(f"Found {len(categories)} categories")
+            logging.info("Found %s categories", len(categories))
             # Save for future use in organized location
-            categories_file = os.path.join(self.categories_dir, 'categories.json')
-            with open(categories_file, 'w', encoding='utf-8') as f:
-                json.dump(categories, f, indent=2, ensure_ascii=False)
+            self.save_categories(categories)
             return categories
         return []
     
     def get_streams_for_category(self, category_id: str, category_name: str) -> List[Dict]:
         """Get all streams for a specific category with better error handling"""
-        logging.info(f"Fetching streams for category: {category_name} (ID: {category_id})")
-        url = f"{self.server}/player_api.php?username={self.username}&password={self.password}&action=get_live_streams&category_id={category_id}"
+        logging.info("Fetching streams for category: %s (ID: %s)", category_name, category_id)
+        url = self.client.api_url('get_live_streams', category_id=category_id)
         
         streams = self.make_api_request(url)
         if streams:
-            logging.info(f"Found {len(streams)} streams in {category_name}")
+            logging.info("Found %s streams in %s", len(streams), category_name)
             return streams
         else:
-            logging.warning(f"No streams found for category: {category_name}")
+            logging.warning("No streams found for category: %s", category_name)
             return []
     
     def build_stream_url(self, stream_id: str) -> str:
         """Build stream URL for a given stream ID"""
-        return f"{self.server}/live/{self.username}/{self.password}/{stream_id}.ts"
+        return self.client.build_stream_url(stream_id)
     
     def create_m3u_playlist(self, all_streams: List[Dict], filename: str = None) -> str:
         """Create M3U playlist from all streams"""
+        from iptv_client import M3USink
+        
         if not filename:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"iptv_complete_playlist_{timestamp}.m3u"
         
         filepath = os.path.join(self.playlists_dir, filename)
         
-        logging.info(f"Creating M3U playlist: {filepath}")
+        logging.info("Creating M3U playlist: %s", filepath)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            # Write M3U header
-            f.write("#EXTM3U\n")
-            f.write(f"# Generated by Robust IPTV Scraper on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"# Server: {self.server}\n")
-            f.write(f"# Total Channels: {len(all_streams)}\n\n")
-            
-            current_category = None
-            
+        comments = [
+            f"Generated by Robust IPTV Scraper on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            f"Server: {self.server}",
+            f"Total Channels: {len(all_streams)}",
+        ]
+        with M3USink(filepath, comments=comments) as playlist:
             for stream in all_streams:
-                # Write category header if category changed
-                if stream.get('category_name') != current_category:
-                    current_category = stream.get('category_name')
-                    f.write(f"\n# {current_category}\n")
-                
-                # Write stream info
-                stream_name = stream.get('name', 'Unknown')
-                stream_url = self.build_stream_url(stream.get('stream_id', ''))
-                
-                f.write(f"#EXTINF:-1 tvg-id=\"{stream.get('stream_id', '')}\" tvg-name=\"{stream_name}\" tvg-logo=\"{stream.get('stream_icon', '')}\" group-title=\"{current_category}\",{stream_name}\n")
-                f.write(f"{stream_url}\n")
-        
-        logging.info(f"M3U playlist created successfully: {filepath}")
+                playlist.write(dict(stream, stream_url=self.build_stream_url(stream.get('stream_id', ''))))
+        
+        logging.info("M3U playlist created successfully: %s", filepath)
         return filepath
     
+    def mirror_stream_logos(self, streams: List[Dict]) -> List[Dict]:
+        """Mirror stream logos locally and point the streams at the mirror"""
+        from logo_mirror import LogoMirror
+        
+        mirror = LogoMirror(self.logos_dir, base_url=self.logo_base_url,
+                            max_workers=self.logo_workers, resize=self.logo_size)
+        if isinstance(streams, list):
+            return mirror.rewrite_streams(streams)
+        
+        # Bounded-memory mode: only the distinct logo URLs are held in memory
+        locations = mirror.mirror(stream.get('stream_icon') for stream in streams)
+        return streams.map(lambda stream: mirror.relocate(stream, locations))
+    
     def scrape_with_resume(self) -> Dict:
         """Scrape all channels with resume capability"""
         logging.info("Starting robust channel scrape...")
         
+        if self.work_queue:
+            return self.scrape_from_queue()
+        
+        categories = self.crawl_categories()
+        if not categories:
+            return {}
+        
+        if self.memory_budget_mb:
+            # complete_data and the playlist are written from the sorted runs
+            all_streams = self.sort_snapshot(categories)
+        else:
+            all_streams = list(self.snapshot.iter_records())
+        
+        # Save complete data
+        complete_data = self.save_complete_data(categories, all_streams)
+        
+        logging.info("Scraping completed! Total streams: %s", len(all_streams))
+        return complete_data
+    
+    def crawl_categories(self) -> List[Dict]:
+        """
+        Fetch the streams of every category into the snapshot record file
+        
+        Progress is saved after each category, and categories completed by an
+        earlier session are skipped.
+        
+        Returns:
+            The category list (empty if it could not be fetched)
+        """
         # Get all categories
         categories = self.load_existing_categories()
         if not categories:
             categories = self.get_categories()
             if not categories:
                 logging.error("Failed to get categories")
-                return {}
+                return []
         
-        all_streams = []
         total_categories = len(categories)
         
         # Check for existing progress
         progress_file = os.path.join(self.logs_dir, "scrape_progress.json")
-        completed_categories = set()
-        
-        if os.path.exists(progress_file):
-            try:
-                with open(progress_file, 'r') as f:
-                    progress = json.load(f)
-                    completed_categories = set(progress.get('completed_categories', []))
-                    all_streams = progress.get('all_streams', [])
-                logging.info(f"Resuming from previous session. Completed categories: {len(completed_categories)}")
-            except Exception as e:
-                logging.warning(f"Failed to load progress: {e}")
+        completed_categories = self.resume_snapshot(progress_file)
         
         for i, category in enumerate(categories, 1):
             category_id = category.get('category_id')
@@ -220,10 +258,10 @@ class RobustIPTVScraper:
             
             # Skip if already completed
             if category_id in completed_categories:
-                logging.info(f"Skipping completed category {i}/{total_categories}: {category_name}")
+                logging.info("Skipping completed category %s/%s: %s", i, total_categories, category_name)
                 continue
             
-            logging.info(f"Processing category {i}/{total_categories}: {category_name}")
+            logging.info("Processing category %s/%s: %s", i, total_categories, category_name)
             
             # Get streams for this category
             streams = self.get_streams_for_category(category_id, category_name)
@@ -232,32 +270,223 @@ class RobustIPTVScraper:
             for stream in streams:
                 stream['category_name'] = category_name
                 stream['category_id'] = category_id
+                self.snapshot.append(stream)
             
-            all_streams.extend(streams)
             completed_categories.add(category_id)
             
             # Save progress after each category
-            progress = {
-                'completed_categories': list(completed_categories),
-                'all_streams': all_streams,
-                'last_updated': datetime.now().isoformat()
-            }
-            with open(progress_file, 'w') as f:
-                json.dump(progress, f, indent=2)
+            self.save_progress(progress_file, completed_categories)
             
             # Save category streams individually
             if streams:
-                safe_filename = f"category_{category_id}_{category_name.replace(' ', '_').replace('/', '_')}.json"
-                filepath = os.path.join(self.streams_dir, safe_filename)
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(streams, f, indent=2, ensure_ascii=False)
+                self.save_category_streams(category_id, category_name, streams)
             
-            logging.info(f"Total streams collected so far: {len(all_streams)}")
+            logging.info("Total streams collected so far: %s", self.snapshot.count)
             
             # Add extra delay between categories to be extra safe
             time.sleep(5)
         
-        # Save complete data
+        # Point the progress at the generation about to be published
+        self.save_progress(progress_file, completed_categories)
+        return categories
+    
+    def resume_snapshot(self, progress_file: str) -> set:
+        """
+        Open the snapshot record file, continuing from saved progress
+        
+        Progress only stores the completed categories and how far the record
+        file of a snapshot generation had been written, so resuming never
+        rewrites or parses the streams scraped so far.
+        
+        Returns:
+            Set of completed category IDs
+        """
+        from snapshot_index import SnapshotWriter
+        
+        completed_categories = set()
+        generation = None
+        offset = entries = 0
+        inline_streams = []
+        
+        if os.path.exists(progress_file):
+            try:
+                with open(progress_file, 'r') as f:
+                    progress = json.load(f)
+                completed_categories = set(progress.get('completed_categories', []))
+                if 'snapshot_generation' in progress:
+                    generation = progress['snapshot_generation']
+                    offset = progress['snapshot_offset']
+                    entries = progress['snapshot_entries']
+                    # Fails if the generation's files are gone or shorter than the progress
+                    self.open_snapshot(SnapshotWriter(self.snapshot_dir, generation, offset, entries))
+                elif 'spool_offset' in progress:
+                    # Bounded-memory progress from before snapshots were written;
+                    # spool_offset is a byte position, so read bytes up to it
+                    spool_file = os.path.join(self.logs_dir, "scrape_spool.jsonl")
+                    with open(spool_file, 'rb') as spool:
+                        committed = spool.read(progress['spool_offset']).decode('utf-8')
+                    inline_streams = [json.loads(line) for line in committed.splitlines()]
+                    os.remove(spool_file)
+                else:
+                    # Older progress files keep the streams inline
+                    inline_streams = progress.get('all_streams', [])
+                logging.info("Resuming from previous session. Completed categories: %s", len(completed_categories))
+            except Exception as e:
+                logging.warning("Failed to load progress: %s", e)
+                completed_categories = set()
+                generation = None
+                inline_streams = []
+        
+        if generation is None:
+            self.open_snapshot(SnapshotWriter(self.snapshot_dir))
+            for stream in inline_streams:
+                self.snapshot.append(stream)
+        return completed_categories
+    
+    def open_snapshot(self, writer):
+        """Make a snapshot writer the current one"""
+        if self.snapshot is not None:
+            self.snapshot.close()
+        self.snapshot = writer
+    
+    def save_progress(self, progress_file: str, completed_categories: set):
+        """Commit the snapshot records and save which categories are done"""
+        offset, entries = self.snapshot.commit()
+        progress = {
+            'completed_categories': list(completed_categories),
+            'snapshot_generation': self.snapshot.generation,
+            'snapshot_offset': offset,
+            'snapshot_entries': entries,
+            'last_updated': datetime.now().isoformat()
+        }
+        save_data(os.path.splitext(progress_file)[0], progress, 'json-compact')
+    
+    def sort_snapshot(self, categories: List[Dict]):
+        """
+        Sort the snapshot records by category order, then channel name
+        
+        The external sort keeps its in-memory buffer within memory_budget_mb,
+        so the catalog is never held in memory as a whole.
+        
+        Returns:
+            The sorter, which yields the streams in order and can be read repeatedly
+        """
+        from external_sort import ExternalSorter, sort_key_text
+        
+        positions = {str(category.get('category_id')): position for position, category in enumerate(categories)}
+        
+        def stream_key(stream: Dict) -> list:
+            return [positions.get(str(stream.get('category_id')), len(positions)),
+                    sort_key_text(stream.get('name'))]
+        
+        if self.sorter is not None:
+            self.sorter.cleanup()
+        self.sorter = ExternalSorter(stream_key, memory_budget=self.memory_budget_mb * 1024 * 1024,
+                                     temp_dir=self.logs_dir)
+        self.sorter.extend(self.snapshot.iter_records())
+        logging.info("Sorted %s streams using %s spill runs", len(self.sorter), len(self.sorter.runs))
+        return self.sorter
+    
+    def cleanup_spill(self):
+        """Remove the temporary sort runs of a bounded-memory scrape"""
+        if self.sorter is not None:
+            self.sorter.cleanup()
+            self.sorter = None
+    
+    def scrape_from_queue(self) -> Dict:
+        """Scrape categories claimed from the shared work queue, then assemble the results"""
+        from work_queue import LeaseKeeper
+        
+        categories = self.work_queue.get_categories()
+        if not categories:
+            categories = self.get_categories()
+            if not categories:
+                logging.error("Failed to get categories")
+                return {}
+            self.work_queue.enqueue(categories)
+        
+        logging.info("Worker %s pulling categories from %s", self.worker_id, self.work_queue.db_path)
+        processed = 0
+        
+        while True:
+            task = self.work_queue.claim(self.worker_id)
+            if task is None:
+                if self.work_queue.is_drained():
+                    break
+                # Other workers still hold leases; wait in case one of them dies
+                time.sleep(self.queue_poll_interval)
+                continue
+            
+            category_id = task['category_id']
+            category_name = task['category_name']
+            logging.info("Processing queued category: %s (%s/%s done)", category_name, self.work_queue.stats()['done'], len(categories))
+            
+            completed = False
+            try:
+                with LeaseKeeper(self.work_queue, self.worker_id, category_id):
+                    streams = self.get_streams_for_category(category_id, category_name)
+                completed = self.work_queue.complete(self.worker_id, category_id, streams)
+                if completed:
+                    processed += 1
+                else:
+                    logging.warning("Lease on %s expired, result discarded", category_name)
+            finally:
+                if not completed:
+                    self.work_queue.release(self.worker_id, category_id)
+            
+            # Add extra delay between categories to be extra safe
+            time.sleep(5)
+        
+        logging.info("Worker %s processed %s categories, queue drained", self.worker_id, processed)
+        
+        # Only the first worker to get here assembles the outputs
+        owner = self.work_queue.claim_reduction(self.worker_id)
+        if owner != self.worker_id:
+            logging.info("Outputs are assembled by worker %s", owner)
+            self.reduced_by = owner
+            return {}
+        return self.reduce_queue()
+    
+    def reduce_queue(self) -> Dict:
+        """Assemble complete_data.json and the category files from the work queue results"""
+        from snapshot_index import SnapshotWriter
+        
+        categories = self.work_queue.get_categories()
+        names = {str(category.get('category_id')): category for category in categories}
+        counts = self.work_queue.stats()
+        if counts['failed']:
+            logging.warning("%s categories failed and are missing from the results", counts['failed'])
+        
+        # One category's results are held in memory at a time
+        self.open_snapshot(SnapshotWriter(self.snapshot_dir))
+        for category_id, category_name, streams in self.work_queue.iter_results():
+            category = names.get(category_id, {'category_id': category_id})
+            for stream in streams:
+                stream['category_name'] = category_name
+                stream['category_id'] = category.get('category_id')
+                self.snapshot.append(stream)
+            if streams:
+                self.save_category_streams(category.get('category_id'), category_name, streams)
+        
+        if self.memory_budget_mb:
+            all_streams = self.sort_snapshot(categories)
+        else:
+            all_streams = list(self.snapshot.iter_records())
+        
+        complete_data = self.save_complete_data(categories, all_streams)
+        
+        logging.info("Scraping completed! Total streams: %s", len(all_streams))
+        return complete_data
+    
+    def save_category_streams(self, category_id: str, category_name: str, streams: List[Dict]) -> str:
+        """Save the streams of one category to its own file"""
+        if not self.write_category_files:
+            return None
+        safe_name = f"category_{category_id}_{category_name.replace(' ', '_').replace('/', '_')}"
+        return save_data(os.path.join(self.streams_dir, safe_name), streams, self.output_format)
+    
+    def save_complete_data(self, categories: List[Dict], all_streams: List[Dict]) -> Dict:
+        """Save and return the complete scrape result"""
         complete_data = {
             'server': self.server,
             'username': self.username,
@@ -268,11 +497,67 @@ class RobustIPTVScraper:
             'streams': all_streams
         }
         
-        filepath = os.path.join(self.output_dir, "complete_data.json")
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(complete_data, f, indent=2, ensure_ascii=False)
+        save_data(os.path.join(self.output_dir, "complete_data"), complete_data, self.output_format)
+        self.save_snapshot(all_streams)
+        return complete_data
+    
+    def save_snapshot(self, all_streams: List[Dict]) -> str:
+        """
+        Finalize the snapshot index for this scrape
+        
+        The crawl strategies and the queue reducer append records as they go;
+        the m3u export is written out here first.
+        """
+        from snapshot_index import DEFAULT_MEMORY_BUDGET, SnapshotWriter
+        
+        if self.snapshot is None:
+            self.snapshot = SnapshotWriter(self.snapshot_dir)
+            for stream in all_streams:
+                self.snapshot.append(stream)
+        memory_budget = self.memory_budget_mb * 1024 * 1024 if self.memory_budget_mb else DEFAULT_MEMORY_BUDGET
+        index_file = self.snapshot.finalize(memory_budget)
+        self.snapshot.close()
+        self.snapshot = None
+        logging.info("Snapshot index saved: %s", index_file)
+        return index_file
+    
+    def scrape_from_export(self) -> Dict:
+        """Scrape all channels from the get.php m3u_plus export in a single download"""
+        from m3u_export import ExportUnavailable, build_export_url, download_export, streams_from_export
+        
+        logging.info("Fetching channels from the m3u_plus export...")
+        export_file = os.path.join(self.output_dir, "provider_export.m3u")
+        url = build_export_url(self.server, self.username, self.password)
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Accept': '*/*',
+            'Connection': 'keep-alive'
+        }
+        
+        try:
+            size = download_export(self.session, url, export_file, headers=headers, timeout=120)
+            logging.info("Downloaded export (%s bytes): %s", size, export_file)
+            # One request for the real category IDs, so records match an API crawl
+            categories, all_streams = streams_from_export(export_file, self.get_categories())
+        except ExportUnavailable as e:
+            logging.warning("m3u_plus export unavailable: %s", e)
+            return {}
+        
+        # Feed the same outputs as the API crawl, but keep the export's category
+        # list apart from the API cache: groups missing from it get m3u_N IDs
+        save_data(os.path.join(self.categories_dir, 'export_categories'), categories, self.output_format)
+        
+        category_streams = {}
+        for stream in all_streams:
+            category_streams.setdefault(stream['category_id'], []).append(stream)
+        for category in categories:
+            streams = category_streams.get(category['category_id'])
+            if streams:
+                self.save_category_streams(category['category_id'], category['category_name'], streams)
         
-        logging.info(f"Scraping completed! Total streams: {len(all_streams)}")
+        complete_data = self.save_complete_data(categories, all_streams)
+        
+        logging.info("Export scrape completed! Total streams: %s", len(all_streams))
         return complete_data
     
     def run(self) -> str:
@@ -282,36 +567,55 @@ class RobustIPTVScraper:
         logging.info("=" * 50)
         
         # Scrape all channels
-        data = self.scrape_with_resume()
+        data = None
+        if self.fetch_strategy == "m3u":
+            data = self.scrape_from_export()
+            if not data:
+                logging.info("Falling back to the player_api.php crawl")
+        if not data:
+            data = self.scrape_with_resume()
+        
+        if self.reduced_by:
+            return None
         
         if not data or not data.get('streams'):
             logging.error("No streams found!")
             return None
         
+        streams = data['streams']
+        if self.mirror_logos:
+            streams = self.mirror_stream_logos(streams)
+        
         # Create M3U playlist
-        m3u_file = self.create_m3u_playlist(data['streams'])
+        m3u_file = self.create_m3u_playlist(streams)
         
         logging.info("=" * 50)
         logging.info("ROBUST IPTV SCRAPER COMPLETED")
-        logging.info(f"M3U Playlist: {m3u_file}")
-        logging.info(f"Total Channels: {len(data['streams'])}")
-        logging.info(f"Total Categories: {len(data['categories'])}")
+        logging.info("M3U Playlist: %s", m3u_file)
+        logging.info("Total Channels: %s", len(data['streams']))
+        logging.info("Total Categories: %s", len(data['categories']))
         logging.info("=" * 50)
         
+        self.cleanup_spill()
+        
         return m3u_file
 
 def main():
     """Main function for command line usage"""
-    if len(sys.argv) != 4:
-        print("Usage: python3 robust_iptv_scraper.py <username> <password> <server>")
+    if len(sys.argv) not in (4, 5) or (len(sys.argv) == 5 and sys.argv[4] not in ("api", "m3u")):
+        print("Usage: python3 robust_iptv_scraper.py <username> <password> <server> [api|m3u]")
         print("Example: python3 robust_iptv_scraper.py your_username your_password http://your-provider.com")
         sys.exit(1)
     
+    configure_logging()
+    
     username = sys.argv[1]
     password = sys.argv[2]
     server = sys.argv[3]
     
-    scraper = RobustIPTVScraper(username, password, server)
+    fetch_strategy = sys.argv[4] if len(sys.argv) == 5 else "api"
+    
+    scraper = RobustIPTVScraper(username, password, server, fetch_strategy=fetch_strategy)
     m3u_file = scraper.run()
     
     if m3u_file:
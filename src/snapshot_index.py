@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Snapshot Index
+Append-only stream record file with a fixed-record, mmap-readable offset index
+
+Each scrape writes a new generation to the snapshot directory:
+    catalog.<gen>.rec  One JSON stream record per line, appended as categories complete
+    catalog.<gen>.ent  Fixed-size entry per record, in append order (lets a scrape resume
+                       without parsing any records)
+    catalog.<gen>.idx  Header plus the entries sorted by stream and by category, for
+                       point lookups, category slices and cheap snapshot diffs
+
+A generation's index is renamed into place once its record file is complete,
+and finished generations are never modified, so readers can keep older
+generations mapped while a new scrape runs. The newest few generations are
+kept for diffing.
+"""
+
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+INDEX_MAGIC = b'IPTVIDX\x00'
+INDEX_VERSION = 1
+
+# magic, format version, entry size, reserved, generation, entry count, record file size, created
+HEADER = struct.Struct('<8sHHIQQQd')
+# stream key, category key, record offset, record length, record crc32
+ENTRY = struct.Struct('<QQQII')
+KEY = struct.Struct('<Q')
+
+# Entries are sorted as raw bytes prefixed with (sort key, record offset) in big-endian order
+SORT_PREFIX = struct.Struct('>QQ')
+SORT_RECORD_SIZE = SORT_PREFIX.size + ENTRY.size
+# Memory per buffered entry while sorting: the prefixed bytes object (allocated in
+# 8-byte steps) and its list slot, with room for the list's over-allocation
+SORT_ENTRY_MEMORY = (sys.getsizeof(bytes(SORT_RECORD_SIZE)) + 7) // 8 * 8 + 16
+
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+DEFAULT_KEEP = 2
+MAX_FANIN = 64
+
+FILE_RE = re.compile(r'^catalog\.(\d+)\.(rec|ent|idx)(\.tmp)?$')
+
+
+def key_hash(value) -> int:
+    """Map a stream or category ID to a 64-bit key"""
+    return KEY.unpack(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest())[0]
+
+
+def generation_path(directory: str, generation: int, kind: str) -> str:
+    """Return the path of a generation's 'rec', 'ent' or 'idx' file"""
+    return os.path.join(directory, f"catalog.{generation}.{kind}")
+
+
+def generations(directory: str, kind: str = 'idx') -> List[int]:
+    """Return the generations that have a file of the given kind, oldest first
+    ('idx' lists the finished generations)"""
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    for name in os.listdir(directory):
+        match = FILE_RE.match(name)
+        if match and match.group(2) == kind and not match.group(3):
+            found.append(int(match.group(1)))
+    return sorted(found)
+
+
+def prune_generations(directory: str, keep: int = DEFAULT_KEEP):
+    """Remove all but the newest `keep` finished generations, and unfinished
+    generations older than the newest finished one"""
+    finished = generations(directory)
+    kept = set(finished[-keep:])
+    newest = finished[-1] if finished else 0
+    for name in os.listdir(directory):
+        match = FILE_RE.match(name)
+        if not match:
+            continue
+        generation = int(match.group(1))
+        if generation in kept or (generation > newest and not match.group(3)):
+            continue
+        os.remove(os.path.join(directory, name))
+
+
+def copy_prefix(source: str, destination: str, length: int):
+    """Copy the first `length` bytes of a file"""
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        remaining = length
+        while remaining:
+            block = src.read(min(remaining, 1024 * 1024))
+            if not block:
+                raise ValueError(f"{source} is shorter than the saved progress")
+            dst.write(block)
+            remaining -= len(block)
+
+
+class SnapshotWriter:
+    def __init__(self, directory: str, generation: int = None, resume_offset: int = 0, resume_entries: int = 0):
+        """
+        Open a snapshot generation for appending
+
+        Args:
+            directory: Snapshot directory
+            generation: Generation to continue (None starts a new one). If it is
+                        already finished, its records up to resume_offset are
+                        copied into a new generation, leaving it untouched
+            resume_offset: Committed size of the record file to continue from
+                           (anything after it is discarded)
+            resume_entries: Committed number of entries matching resume_offset
+
+        Raises:
+            ValueError: If the files to resume are missing or shorter than the progress
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        base = None
+        if generation is None:
+            resume_offset = resume_entries = 0
+        elif generation in generations(directory):
+            base = generation
+        if generation is None or base is not None:
+            existing = generations(directory) + generations(directory, 'rec') + generations(directory, 'ent')
+            generation = max(existing, default=0) + 1
+
+        self.generation = generation
+        self.record_path = generation_path(directory, generation, 'rec')
+        self.entry_path = generation_path(directory, generation, 'ent')
+        self.index_path = generation_path(directory, generation, 'idx')
+
+        if base is not None:
+            copy_prefix(generation_path(directory, base, 'rec'), self.record_path, resume_offset)
+            copy_prefix(generation_path(directory, base, 'ent'), self.entry_path, resume_entries * ENTRY.size)
+        elif resume_offset or resume_entries:
+            for path, size in ((self.record_path, resume_offset), (self.entry_path, resume_entries * ENTRY.size)):
+                if not os.path.exists(path) or os.path.getsize(path) < size:
+                    raise ValueError(f"{path} is missing or shorter than the saved progress")
+
+        self._records = open(self.record_path, 'ab')
+        self._entries = open(self.entry_path, 'ab')
+        self._records.truncate(resume_offset)
+        self._entries.truncate(resume_entries * ENTRY.size)
+        self._records.seek(resume_offset)
+        self._entries.seek(resume_entries * ENTRY.size)
+        self.offset = resume_offset
+        self.count = resume_entries
+
+    def append(self, stream: Dict):
+        """Append one stream record"""
+        data = json.dumps(stream, ensure_ascii=False).encode('utf-8')
+        self._records.write(data)
+        self._records.write(b"\n")
+        self._entries.write(ENTRY.pack(
+            key_hash(stream.get('stream_id')),
+            key_hash(stream.get('category_id')),
+            self.offset,
+            len(data),
+            zlib.crc32(data)
+        ))
+        self.offset += len(data) + 1
+        self.count += 1
+
+    def commit(self) -> Tuple[int, int]:
+        """Flush appended records; returns (offset, entries) to store for resuming"""
+        self._records.flush()
+        self._entries.flush()
+        return self.offset, self.count
+
+    def iter_records(self) -> Iterator[Dict]:
+        """Read back every committed record in append order"""
+        self.commit()
+        with open(self.record_path, 'rb') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def finalize(self, memory_budget: int = DEFAULT_MEMORY_BUDGET, keep: int = DEFAULT_KEEP) -> str:
+        """
+        Write this generation's index and publish it
+
+        The entries are sorted within memory_budget (spilling sorted runs to
+        disk beyond it), and the index is renamed into place only after the
+        record file is on disk. Older generations beyond `keep` are removed.
+
+        Returns:
+            Path of the index file
+        """
+        self.commit()
+        os.fsync(self._records.fileno())
+        os.fsync(self._entries.fileno())
+
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, ENTRY.size, 0, self.generation,
+                                self.count, self.offset, time.time()))
+            # Stream section, then category section; both in append order within a key
+            for field in (0, 1):
+                sort_entries(self.entry_path, self.count, field, f, memory_budget, self.directory)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+        prune_generations(self.directory, keep)
+        return self.index_path
+
+    def close(self):
+        self._records.close()
+        self._entries.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_sorted_run(path: str) -> Iterator[bytes]:
+    """Yield the prefixed entries of a sorted run file"""
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(SORT_RECORD_SIZE * 1024)
+            if not block:
+                return
+            for position in range(0, len(block), SORT_RECORD_SIZE):
+                yield block[position:position + SORT_RECORD_SIZE]
+
+
+def sort_entries(entry_path: str, count: int, field: int, out: BinaryIO, memory_budget: int, temp_dir: str):
+    """
+    Write the first `count` entries of an entry file to `out`, ordered by
+    (field, record offset)
+
+    Entries beyond memory_budget are sorted in runs on disk and merged.
+    """
+    chunk_entries = max(1024, memory_budget // SORT_ENTRY_MEMORY)
+    run_dir = None
+    runs = []
+    try:
+        with open(entry_path, 'rb') as f:
+            remaining = count
+            while remaining:
+                chunk = []
+                while remaining and len(chunk) < chunk_entries:
+                    raw = f.read(min(remaining, chunk_entries - len(chunk), 4096) * ENTRY.size)
+                    if not raw:
+                        raise ValueError(f"{entry_path} is shorter than its entry count")
+                    remaining -= len(raw) // ENTRY.size
+                    for position in range(0, len(raw), ENTRY.size):
+                        entry = ENTRY.unpack_from(raw, position)
+                        chunk.append(SORT_PREFIX.pack(entry[field], entry[2]) + raw[position:position + ENTRY.size])
+                chunk.sort()
+
+                if not runs and not remaining:
+                    # Everything fitted in memory, no need to touch the disk
+                    for record in chunk:
+                        out.write(record[SORT_PREFIX.size:])
+                    return
+
+                if run_dir is None:
+                    run_dir = tempfile.mkdtemp(prefix="index_runs_", dir=temp_dir)
+                run_file = os.path.join(run_dir, f"run_{len(runs):06d}")
+                with open(run_file, 'wb') as run:
+                    run.writelines(chunk)
+                runs.append(run_file)
+                del chunk
+
+        # Merge in groups until few enough runs remain to merge at once
+        while len(runs) > MAX_FANIN:
+            merged_runs = []
+            for start in range(0, len(runs), MAX_FANIN):
+                group = runs[start:start + MAX_FANIN]
+                run_file = os.path.join(run_dir, f"merge_{len(merged_runs):06d}_{os.path.basename(group[0])}")
+                with open(run_file, 'wb') as run:
+                    for record in heapq.merge(*(read_sorted_run(path) for path in group)):
+                        run.write(record)
+                for path in group:
+                    os.remove(path)
+                merged_runs.append(run_file)
+            runs = merged_runs
+
+        for record in heapq.merge(*(read_sorted_run(path) for path in runs)):
+            out.write(record[SORT_PREFIX.size:])
+    finally:
+        if run_dir is not None:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def map_file(path: str):
+    """Memory-map a file read-only (None for empty files, which cannot be mapped)"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class SnapshotIndex:
+    def __init__(self, directory: str, generation: int = None):
+        """
+        Open a finished snapshot generation for random access
+
+        Args:
+            directory: Snapshot directory
+            generation: Generation to open (the newest by default)
+
+        Raises:
+            ValueError: If there is no index, it has an unknown version, or its
+                        record file does not match it
+        """
+        self.directory = directory
+        if generation is None:
+            finished = generations(directory)
+            if not finished:
+                raise ValueError(f"No snapshot index in {directory}")
+            generation = finished[-1]
+
+        index_path = generation_path(directory, generation, 'idx')
+        if not os.path.exists(index_path):
+            raise ValueError(f"No snapshot generation {generation} in {directory}")
+        self._index = map_file(index_path)
+        self._records = None
+        try:
+            if self._index is None or len(self._index) < HEADER.size:
+                raise ValueError(f"Not a snapshot index: {index_path}")
+
+            magic, version, entry_size, _, stored_generation, count, record_size, created = \
+                HEADER.unpack_from(self._index, 0)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION or entry_size != ENTRY.size:
+                raise ValueError(f"Unsupported snapshot index (version {version}): {index_path}")
+            if stored_generation != generation or len(self._index) != HEADER.size + 2 * count * ENTRY.size:
+                raise ValueError(f"Snapshot index is damaged: {index_path}")
+
+            self.record_path = generation_path(directory, generation, 'rec')
+            actual_size = os.path.getsize(self.record_path) if os.path.exists(self.record_path) else -1
+            if actual_size != record_size:
+                raise ValueError(f"Record file {self.record_path} does not match its index "
+                                 f"({actual_size} bytes, expected {record_size})")
+            self._records = map_file(self.record_path) if record_size else None
+        except Exception:
+            self.close()
+            raise
+
+        self.generation = generation
+        self.count = count
+        self.record_size = record_size
+        self.created = created
+        self._stream_section = HEADER.size
+        self._category_section = HEADER.size + count * ENTRY.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def entry(self, section: int, position: int) -> Tuple[int, int, int, int, int]:
+        """Unpack entry number `position` of a section"""
+        return ENTRY.unpack_from(self._index, section + position * ENTRY.size)
+
+    def lower_bound(self, section: int, field: int, key: int) -> int:
+        """Binary search for the first entry whose field is >= key"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.entry(section, middle)[field] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def read_record(self, offset: int, length: int, crc: int) -> Dict:
+        """
+        Deserialise one record, checking it against its stored CRC32
+
+        Raises:
+            ValueError: If the record does not match its checksum
+        """
+        data = self._records[offset:offset + length]
+        if zlib.crc32(data) != crc:
+            raise ValueError(f"Corrupt snapshot record at offset {offset} of {self.record_path}")
+        return json.loads(data)
+
+    def get(self, stream_id) -> Optional[Dict]:
+        """Look up one stream by ID without reading any other record"""
+        key = key_hash(stream_id)
+        position = self.lower_bound(self._stream_section, 0, key)
+        while position < self.count:
+            stream_key, _, offset, length, crc = self.entry(self._stream_section, position)
+            if stream_key != key:
+                break
+            record = self.read_record(offset, length, crc)
+            if str(record.get('stream_id')) == str(stream_id):
+                return record
+            position += 1
+        return None
+
+    def category(self, category_id) -> Iterator[Dict]:
+        """Yield the streams of one category, in scrape order"""
+        key = key_hash(category_id)
+        position = self.lower_bound(self._category_section, 1, key)
+        while position < self.count:
+            _, category_key, offset, length, crc = self.entry(self._category_section, position)
+            if category_key != key:
+                break
+            record = self.read_record(offset, length, crc)
+            if str(record.get('category_id')) == str(category_id):
+                yield record
+            position += 1
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Yield every stream in scrape order"""
+        if self._records is None:
+            return
+        with open(self.record_path, 'rb') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def stream_entries(self) -> Iterator[Tuple[int, int, int, int, int]]:
+        """Yield index entries ordered by stream key"""
+        for position in range(self.count):
+            yield self.entry(self._stream_section, position)
+
+    def diff(self, other: 'SnapshotIndex') -> Dict[str, List[Dict]]:
+        """
+        Compare this (newer) snapshot against an older one
+
+        Only the index entries are compared; records are read just for streams
+        that were added, removed or changed.
+
+        Returns:
+            Dict with 'added', 'removed' and 'changed' stream records
+        """
+        result = {'added': [], 'removed': [], 'changed': []}
+        new_entries = self.stream_entries()
+        old_entries = other.stream_entries()
+        new = next(new_entries, None)
+        old = next(old_entries, None)
+
+        while new is not None or old is not None:
+            if old is None or (new is not None and new[0] < old[0]):
+                result['added'].append(self.read_record(*new[2:]))
+                new = next(new_entries, None)
+            elif new is None or old[0] < new[0]:
+                result['removed'].append(other.read_record(*old[2:]))
+                old = next(old_entries, None)
+            else:
+                if new[4] != old[4]:
+                    result['changed'].append(self.read_record(*new[2:]))
+                new = next(new_entries, None)
+                old = next(old_entries, None)
+        return result
+
+    def close(self):
+        if self._records is not None:
+            self._records.close()
+            self._records = None
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
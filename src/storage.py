@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Storage
+Output encodings for scrape data, with atomic writes and a format-agnostic reader
+
+Formats:
+    json          Indented JSON (the original output)
+    json-compact  JSON without whitespace
+    jsonl         JSON Lines; dicts are stored as a header line plus one stream per line
+    json.gz / jsonl.gz    gzip compressed variants
+    json.zst / jsonl.zst  zstd compressed variants (requires zstandard)
+    parquet       Columnar stream table (requires pyarrow)
+"""
+
+import gzip
+import io
+import json
+import os
+import tempfile
+from typing import Any, Dict, IO, Iterable, Optional
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, only needed for .zst output
+    zstandard = None
+
+FORMATS = {
+    'json': '.json',
+    'json-compact': '.json',
+    'jsonl': '.jsonl',
+    'json.gz': '.json.gz',
+    'jsonl.gz': '.jsonl.gz',
+    'json.zst': '.json.zst',
+    'jsonl.zst': '.jsonl.zst',
+    'parquet': '.parquet',
+}
+
+DEFAULT_FORMAT = 'json'
+
+# Key under which a dict's top-level values are stored in line-based formats
+META_KEY = '__meta__'
+
+# Dict key holding the record table in complete_data
+TABLE_KEY = 'streams'
+
+
+def validate_format(fmt: str):
+    """Raise ValueError for an unknown format name"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format: {fmt} (choose from {', '.join(FORMATS)})")
+
+
+def data_path(base_path: str, fmt: str = DEFAULT_FORMAT) -> str:
+    """Return the file path for a base path (without extension) in a format"""
+    validate_format(fmt)
+    return base_path + FORMATS[fmt]
+
+
+def find_data(base_path: str) -> Optional[str]:
+    """Return the most recently written file for a base path in any format"""
+    candidates = [base_path + extension for extension in set(FORMATS.values())]
+    existing = [path for path in candidates if os.path.exists(path)]
+    if not existing:
+        return None
+    return max(existing, key=os.path.getmtime)
+
+
+def compression_of(name: str) -> Optional[str]:
+    """Return 'gz', 'zst' or None for a format name or file path"""
+    if name.endswith('.gz'):
+        return 'gz'
+    if name.endswith('.zst'):
+        return 'zst'
+    return None
+
+
+def open_compressed(path: str, mode: str, compression: Optional[str]) -> IO:
+    """Open a file for binary IO with optional compression"""
+    if compression == 'gz':
+        return gzip.open(path, mode, compresslevel=6)
+    if compression == 'zst':
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed, cannot use .zst files (pip install zstandard)")
+        raw = open(path, mode)
+        if 'w' in mode:
+            return zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return open(path, mode)
+
+
+def iter_lines(data: Any) -> Iterable[Any]:
+    """Split data into JSON Lines records"""
+    if isinstance(data, dict):
+        meta = {key: value for key, value in data.items() if key != TABLE_KEY}
+        yield {META_KEY: meta, 'has_table': TABLE_KEY in data}
+        yield from data.get(TABLE_KEY, [])
+    else:
+        yield from data
+
+
+def is_streamed(data: Any) -> bool:
+    """True if data is a dict whose stream table is a lazy iterable rather than a list"""
+    return isinstance(data, dict) and TABLE_KEY in data and not isinstance(data[TABLE_KEY], list)
+
+
+def write_streamed_json(text: IO, data: Dict, indent: Optional[int]):
+    """Write a dict whose stream table is an iterable, one record at a time
+
+    The output is identical to json.dump with the same indentation.
+    """
+    if indent:
+        def encode(value, depth):
+            return json.dumps(value, indent=indent, ensure_ascii=False).replace("\n", "\n" + " " * indent * depth)
+        newline, pad, item_pad, key_sep = "\n", " " * indent, " " * indent * 2, ": "
+    else:
+        def encode(value, depth):
+            return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        newline, pad, item_pad, key_sep = "", "", "", ":"
+
+    text.write("{")
+    for number, (key, value) in enumerate(data.items()):
+        text.write(("," if number else "") + newline + pad + json.dumps(key, ensure_ascii=False) + key_sep)
+        if key != TABLE_KEY:
+            text.write(encode(value, 1))
+            continue
+
+        text.write("[")
+        empty = True
+        for record in value:
+            text.write(("" if empty else ",") + newline + item_pad + encode(record, 2))
+            empty = False
+        text.write("]" if empty else newline + pad + "]")
+    text.write(newline + "}" if data else "}")
+
+
+def write_json(f: IO, data: Any, fmt: str):
+    """Write data to a binary file in a JSON based format"""
+    text = io.TextIOWrapper(f, encoding='utf-8', write_through=True)
+    if fmt.startswith('jsonl'):
+        for record in iter_lines(data):
+            text.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+            text.write("\n")
+    elif is_streamed(data):
+        write_streamed_json(text, data, 2 if fmt == 'json' else None)
+    elif fmt == 'json':
+        json.dump(data, text, indent=2, ensure_ascii=False)
+    else:
+        json.dump(data, text, ensure_ascii=False, separators=(',', ':'))
+    text.flush()
+    text.detach()
+
+
+def write_parquet(path: str, data: Any):
+    """Write the stream table as Parquet, keeping dict metadata in the schema"""
+    if is_streamed(data):
+        raise ValueError("parquet output needs the whole stream table, use a JSON based format")
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("pyarrow is not installed, cannot write parquet files (pip install pyarrow)")
+
+    meta = None
+    records = data
+    if isinstance(data, dict):
+        meta = {key: value for key, value in data.items() if key != TABLE_KEY}
+        records = data.get(TABLE_KEY, [])
+
+    names = []
+    for record in records:
+        for name in record:
+            if name not in names:
+                names.append(name)
+
+    columns = {}
+    json_columns = []
+    for name in names:
+        values = [record.get(name) for record in records]
+        try:
+            columns[name] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed value types (common in provider data): keep them as JSON text
+            columns[name] = pa.array([None if value is None else json.dumps(value, ensure_ascii=False)
+                                      for value in values], type=pa.string())
+            json_columns.append(name)
+
+    table = pa.table(columns) if columns else pa.table({})
+    schema_meta = {'iptv_json_columns': json.dumps(json_columns)}
+    if meta is not None:
+        schema_meta['iptv_meta'] = json.dumps(meta, ensure_ascii=False)
+    table = table.replace_schema_metadata(schema_meta)
+    pq.write_table(table, path, compression='zstd')
+
+
+def read_parquet(path: str) -> Any:
+    """Read a file written by write_parquet"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("pyarrow is not installed, cannot read parquet files (pip install pyarrow)")
+
+    table = pq.read_table(path)
+    schema_meta = table.schema.metadata or {}
+    json_columns = json.loads(schema_meta.get(b'iptv_json_columns', b'[]'))
+    records = table.to_pylist()
+    for record in records:
+        for name in json_columns:
+            if record.get(name) is not None:
+                record[name] = json.loads(record[name])
+
+    if b'iptv_meta' in schema_meta:
+        data = json.loads(schema_meta[b'iptv_meta'])
+        data[TABLE_KEY] = records
+        return data
+    return records
+
+
+def save_data(base_path: str, data: Any, fmt: str = DEFAULT_FORMAT) -> str:
+    """
+    Save data atomically in the given format
+
+    The data is written to a temporary file in the same directory and renamed
+    into place, so readers never see a partially written file.
+
+    Args:
+        base_path: Path without extension (e.g. output/complete_data)
+        data: List of records or a dict (its 'streams' list is stored as the table).
+              For JSON based formats 'streams' may be any iterable, which is
+              written one record at a time
+        fmt: One of FORMATS
+
+    Returns:
+        Path of the written file
+    """
+    path = data_path(base_path, fmt)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    os.close(fd)
+    os.chmod(tmp_path, 0o644)
+    try:
+        if fmt == 'parquet':
+            write_parquet(tmp_path, data)
+        else:
+            with open_compressed(tmp_path, 'wb', compression_of(fmt)) as f:
+                write_json(f, data, fmt)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def load_data(path: str) -> Any:
+    """Load a file written in any of the supported formats"""
+    if path.endswith('.parquet'):
+        return read_parquet(path)
+
+    with open_compressed(path, 'rb', compression_of(path)) as f:
+        text = io.TextIOWrapper(f, encoding='utf-8')
+        if '.jsonl' in os.path.basename(path):
+            return load_lines(text)
+        return json.load(text)
+
+
+def load_lines(text: IO) -> Any:
+    """Rebuild data written as JSON Lines"""
+    records = []
+    meta = None
+    for number, line in enumerate(text):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if number == 0 and isinstance(record, dict) and META_KEY in record:
+            meta = record[META_KEY]
+            has_table = record.get('has_table', True)
+            continue
+        records.append(record)
+
+    if meta is None:
+        return records
+    if records or has_table:
+        meta[TABLE_KEY] = records
+    return meta
+
+
+def load_named(base_path: str, default: Any = None) -> Any:
+    """Load the newest file for a base path in any format, or return default"""
+    path = find_data(base_path)
+    if path is None:
+        return default
+    return load_data(path)
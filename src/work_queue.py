@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Category Work Queue
+Lease-based SQLite queue that lets several workers share one scrape
+
+The queue relies on SQLite locking and WAL shared memory, which only work
+between processes on one host. The database must be on a local disk, not on
+a network filesystem.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    category_id TEXT PRIMARY KEY,
+    category_name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker_id TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, position);
+"""
+
+# File systems on which SQLite locking and WAL shared memory are unreliable
+NETWORK_FILESYSTEMS = {'nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'fuse.sshfs', 'afs', '9p', 'ceph', 'glusterfs'}
+
+
+def filesystem_type(path: str) -> Optional[str]:
+    """Return the file system type holding a path (Linux only, None if unknown)"""
+    try:
+        with open('/proc/mounts', 'r') as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return None
+
+    path = os.path.realpath(path)
+    best, fs_type = '', None
+    for mount_point, mount_type in mounts:
+        mount_point = mount_point.replace('\\040', ' ')
+        inside = path == mount_point or path.startswith(mount_point.rstrip('/') + '/')
+        if inside and len(mount_point) >= len(best):
+            best, fs_type = mount_point, mount_type
+    return fs_type
+
+
+def default_worker_id() -> str:
+    """Identify this worker by host and process"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class CategoryWorkQueue:
+    def __init__(self, db_path: str, lease_seconds: int = 300, max_attempts: int = 5):
+        """
+        Initialize Category Work Queue
+
+        Args:
+            db_path: SQLite database shared by all workers (on a local disk)
+            lease_seconds: How long a claimed category stays reserved without a heartbeat
+            max_attempts: Claims allowed per category before it is marked failed
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        fs_type = filesystem_type(db_dir)
+        if fs_type in NETWORK_FILESYSTEMS:
+            raise ValueError(f"Work queue {db_path} is on a network filesystem ({fs_type}); SQLite cannot "
+                             "lock it safely, use a local disk and run the workers on that host")
+
+        self.conn = sqlite3.connect(db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def transaction(self):
+        """Start a write transaction that blocks other writers"""
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def enqueue(self, categories: List[Dict]) -> int:
+        """Add categories to the queue (already queued categories are kept as is)"""
+        with self._lock:
+            self.transaction()
+            try:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO meta (key, value) VALUES ('categories', ?)",
+                    (json.dumps(categories, ensure_ascii=False),)
+                )
+                added = 0
+                for position, category in enumerate(categories):
+                    cursor = self.conn.execute(
+                        "INSERT OR IGNORE INTO tasks (category_id, category_name, position, updated) "
+                        "VALUES (?, ?, ?, ?)",
+                        (str(category.get('category_id')), category.get('category_name', 'Unknown'),
+                         position, time.time())
+                    )
+                    added += cursor.rowcount
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        if added:
+            logging.info("Queued %s categories in %s", added, self.db_path)
+        return added
+
+    def get_categories(self) -> List[Dict]:
+        """Return the category list the queue was created with"""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'categories'").fetchone()
+        return json.loads(row[0]) if row else []
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """Lease the next pending (or abandoned) category to a worker"""
+        now = time.time()
+        with self._lock:
+            self.transaction()
+            try:
+                while True:
+                    row = self.conn.execute(
+                        "SELECT category_id, category_name, attempts FROM tasks "
+                        "WHERE (state = 'pending' OR (state = 'leased' AND lease_expires < ?)) "
+                        "ORDER BY position LIMIT 1",
+                        (now,)
+                    ).fetchone()
+                    if row is None:
+                        self.conn.execute("COMMIT")
+                        return None
+
+                    category_id, category_name, attempts = row
+                    if attempts < self.max_attempts:
+                        break
+
+                    self.conn.execute(
+                        "UPDATE tasks SET state = 'failed', worker_id = NULL, updated = ? WHERE category_id = ?",
+                        (now, category_id)
+                    )
+                    logging.error("Category %s failed after %s attempts", category_name, attempts)
+
+                self.conn.execute(
+                    "UPDATE tasks SET state = 'leased', worker_id = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated = ? WHERE category_id = ?",
+                    (worker_id, now + self.lease_seconds, now, category_id)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return {'category_id': category_id, 'category_name': category_name}
+
+    def heartbeat(self, worker_id: str, category_id: str) -> bool:
+        """Extend a lease; returns False if the worker no longer holds it"""
+        now = time.time()
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated = ? "
+                "WHERE category_id = ? AND worker_id = ? AND state = 'leased'",
+                (now + self.lease_seconds, now, str(category_id), worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, worker_id: str, category_id: str, streams: List[Dict]) -> bool:
+        """Store a category's streams; returns False if the lease was lost"""
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE tasks SET state = 'done', result = ?, lease_expires = NULL, updated = ? "
+                "WHERE category_id = ? AND worker_id = ? AND state = 'leased'",
+                (json.dumps(streams, ensure_ascii=False), time.time(), str(category_id), worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, worker_id: str, category_id: str):
+        """Give a leased category back to the queue"""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE tasks SET state = 'pending', worker_id = NULL, lease_expires = NULL, updated = ? "
+                "WHERE category_id = ? AND worker_id = ? AND state = 'leased'",
+                (time.time(), str(category_id), worker_id)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """Count categories by state"""
+        with self._lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall()
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update(dict(rows))
+        return counts
+
+    def is_drained(self) -> bool:
+        """True once no category is waiting or being worked on"""
+        counts = self.stats()
+        return counts['pending'] == 0 and counts['leased'] == 0
+
+    def claim_reduction(self, worker_id: str, force: bool = False) -> Optional[str]:
+        """
+        Reserve assembling the outputs for one worker
+
+        Returns:
+            The worker that holds the reservation (worker_id if it was taken
+            now, or already held by it)
+        """
+        with self._lock:
+            self.transaction()
+            try:
+                if force:
+                    self.conn.execute("DELETE FROM meta WHERE key = 'reduced_by'")
+                self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('reduced_by', ?)", (worker_id,))
+                owner = self.conn.execute("SELECT value FROM meta WHERE key = 'reduced_by'").fetchone()[0]
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return owner
+
+    def iter_results(self) -> Iterator[Tuple[str, str, List[Dict]]]:
+        """Yield (category_id, category_name, streams) for finished categories in queue order"""
+        with self._lock:
+            category_ids = [row[0] for row in self.conn.execute(
+                "SELECT category_id FROM tasks WHERE state = 'done' ORDER BY position"
+            )]
+        # Load one result at a time so the whole catalog is never in memory
+        for category_id in category_ids:
+            with self._lock:
+                category_name, result = self.conn.execute(
+                    "SELECT category_name, result FROM tasks WHERE category_id = ?", (category_id,)
+                ).fetchone()
+            yield category_id, category_name, json.loads(result)
+
+    def close(self):
+        self.conn.close()
+
+
+class LeaseKeeper:
+    """Background heartbeat that keeps a lease alive while a category is fetched"""
+
+    def __init__(self, queue: CategoryWorkQueue, worker_id: str, category_id: str):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.category_id = category_id
+        self.interval = max(1, queue.lease_seconds / 3)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.queue.heartbeat(self.worker_id, self.category_id):
+                logging.warning("Lost lease on category %s", self.category_id)
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
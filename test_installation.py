@@ -6,6 +6,8 @@ Test script to verify M3U Scraper installation
 import sys
 import importlib
 import os
+import tempfile
+import time
 
 def test_imports():
     """Test that all required modules can be imported"""
@@ -99,6 +101,119 @@ def test_directories():
     
     return True
 
+def test_work_queue():
+    """Test that expired leases are handed out again and stale workers lose them"""
+    print("\n🔍 Testing work queue leases...")
+    
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+    from work_queue import CategoryWorkQueue
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        queue = CategoryWorkQueue(os.path.join(temp_dir, 'queue.db'), lease_seconds=0.2, max_attempts=2)
+        try:
+            queue.enqueue([{'category_id': '1', 'category_name': 'News'},
+                           {'category_id': '2', 'category_name': 'Sport'}])
+            checks = []
+            
+            first = queue.claim('worker-a')
+            checks.append(("first claim gets the first category", first['category_id'] == '1'))
+            second = queue.claim('worker-b')
+            checks.append(("a live lease is not handed out twice", second['category_id'] == '2'))
+            checks.append(("queue is empty while leases are live", queue.claim('worker-b') is None))
+            
+            time.sleep(0.3)
+            reclaimed = queue.claim('worker-b')
+            checks.append(("expired lease is re-claimed", reclaimed['category_id'] == '1'))
+            checks.append(("stale worker cannot heartbeat", not queue.heartbeat('worker-a', '1')))
+            checks.append(("stale worker cannot complete", not queue.complete('worker-a', '1', [])))
+            checks.append(("new holder completes", queue.complete('worker-b', '1', [{'stream_id': 1}])))
+            
+            time.sleep(0.3)
+            retried = queue.claim('worker-c')
+            checks.append(("abandoned category is retried", retried['category_id'] == '2'))
+            time.sleep(0.3)
+            checks.append(("category over max_attempts fails", queue.claim('worker-c') is None))
+            checks.append(("queue drains", queue.is_drained() and queue.stats()['failed'] == 1))
+            checks.append(("first worker reserves the outputs", queue.claim_reduction('worker-b') == 'worker-b'))
+            checks.append(("later workers leave them alone", queue.claim_reduction('worker-c') == 'worker-b'))
+            checks.append(("forced reduce takes them over", queue.claim_reduction('cli', force=True) == 'cli'))
+        finally:
+            queue.close()
+    
+    for description, passed in checks:
+        print(f"  {'✅' if passed else '❌'} {description}")
+    return all(passed for _, passed in checks)
+
+def test_snapshot_index():
+    """Test snapshot generations: resuming, lookups, diffs, pruning and the external sort"""
+    print("\n🔍 Testing snapshot index...")
+    
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+    from external_sort import ExternalSorter
+    from snapshot_index import SORT_ENTRY_MEMORY, SnapshotIndex, SnapshotWriter, generations
+    
+    def stream(stream_id, category_id, name):
+        return {'stream_id': stream_id, 'category_id': category_id, 'name': name}
+    
+    checks = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # A scrape interrupted after its progress was saved: the later appends are discarded
+        with SnapshotWriter(temp_dir) as writer:
+            for stream_id in range(1, 1601):
+                writer.append(stream(stream_id, stream_id % 3, f"Channel {stream_id}"))
+                if stream_id == 1200:
+                    first_part = writer.commit()
+            offset, entries = writer.commit()
+            writer.append(stream(9999, 0, "Uncommitted"))
+            generation = writer.generation
+        with SnapshotWriter(temp_dir, generation, offset, entries) as writer:
+            for stream_id in range(1601, 2401):
+                writer.append(stream(stream_id, stream_id % 3, f"Channel {stream_id}"))
+            # The smallest sort chunk is 1024 entries, so the index is sorted in three runs
+            writer.finalize(memory_budget=SORT_ENTRY_MEMORY)
+        
+        with SnapshotIndex(temp_dir) as snapshot:
+            checks.append(("resumed generation has every committed stream", len(snapshot) == 2400))
+            checks.append(("lookup by stream ID", snapshot.get(2202) == stream(2202, 0, "Channel 2202")))
+            checks.append(("uncommitted stream was discarded", snapshot.get(9999) is None))
+            category_ids = [record['stream_id'] for record in snapshot.category(1)]
+            checks.append(("category slice in append order", category_ids == list(range(1, 2401, 3))))
+        
+        # Rescrape continuing from the finished generation's first 1200 streams
+        with SnapshotWriter(temp_dir, generation, *first_part) as writer:
+            for stream_id in range(1201, 2501):
+                name = "Channel 1500 HD" if stream_id == 1500 else f"Channel {stream_id}"
+                writer.append(stream(stream_id, stream_id % 3, name))
+            writer.finalize()
+            rescrape = writer.generation
+        
+        with SnapshotIndex(temp_dir, generation) as old, SnapshotIndex(temp_dir) as new:
+            checks.append(("rescrape is a new generation", new.generation == rescrape != generation))
+            checks.append(("older generation is unchanged", len(old) == 2400))
+            changes = new.diff(old)
+            checks.append(("diff finds added streams",
+                           sorted(record['stream_id'] for record in changes['added']) == list(range(2401, 2501))))
+            checks.append(("diff finds changed streams",
+                           [record['name'] for record in changes['changed']] == ["Channel 1500 HD"]))
+            checks.append(("diff finds no removals", changes['removed'] == []))
+        
+        with SnapshotWriter(temp_dir) as writer:
+            writer.append(stream(1, 1, "Channel 1"))
+            writer.finalize(keep=2)
+        checks.append(("only the newest generations are kept",
+                       generations(temp_dir) == [rescrape, writer.generation]))
+        
+        with ExternalSorter(lambda record: [record['name']], memory_budget=4096, temp_dir=temp_dir) as sorter:
+            names = [f"name {index * 7919 % 500:03d}" for index in range(500)]
+            sorter.extend({'name': name} for name in names)
+            checks.append(("external sort spills runs", len(sorter.runs) > 1))
+            checks.append(("external sort output is ordered",
+                           [record['name'] for record in sorter] == sorted(names)))
+    
+    for description, passed in checks:
+        print(f"  {'✅' if passed else '❌'} {description}")
+    return all(passed for _, passed in checks)
+
 def main():
     """Run all tests"""
     print("🧪 M3U Scraper Installation Test")
@@ -122,6 +237,14 @@ def main():
     if not test_directories():
         all_passed = False
     
+    # Test work queue leases
+    if not test_work_queue():
+        all_passed = False
+    
+    # Test snapshot index
+    if not test_snapshot_index():
+        all_passed = False
+    
     print("\n" + "=" * 40)
     if all_passed:
         print("✅ All tests passed! Installation is ready.")